@@ -0,0 +1,78 @@
+"""
+Benchmark: per-row trend inserts (one SELECT + commit per item) vs. upsert_trends.
+
+Run from the backend folder:
+    python -m benchmarks.bench_trend_upsert --rows 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db import Base
+from database.models import Trend
+from database.crud import upsert_trends
+
+
+def _rows(n: int, offset: int = 0):
+    return [
+        {
+            "arxiv_id": f"2501.{offset + i:05d}",
+            "title": f"Paper {offset + i}",
+            "summary": "An abstract about transformers. " * 20,
+            "field": "Machine Learning Theory",
+            "published_at": "Mon, 06 Jan 2025 00:00:00 -0500",
+        }
+        for i in range(n)
+    ]
+
+
+def _session(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)(), engine
+
+
+def per_row_loop(db, rows):
+    """The previous /trends/trending write path."""
+    for it in rows:
+        existing = db.query(Trend).filter(Trend.arxiv_id == it["arxiv_id"]).first()
+        if not existing:
+            db.add(Trend(**it))
+            db.commit()
+
+
+def bulk_upsert(db, rows, batch: int):
+    for start in range(0, len(rows), batch):
+        upsert_trends(db, rows[start:start + batch])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=50, help="Rows per upsert call (a feed page)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        for name in ("per_row_loop", "bulk_upsert"):
+            db, engine = _session(os.path.join(tmp, f"{name}.db"))
+            rows = _rows(args.rows)
+            start = time.perf_counter()
+            if name == "per_row_loop":
+                per_row_loop(db, rows)
+            else:
+                bulk_upsert(db, rows, args.batch)
+            timings[name] = time.perf_counter() - start
+            assert db.query(Trend).count() == args.rows
+            db.close()
+            engine.dispose()
+
+    for name, seconds in timings.items():
+        print(f"{name:14s} {args.rows} rows in {seconds:7.3f}s  ({args.rows / seconds:10.0f} rows/sec)")
+    print(f"speedup        {timings['per_row_loop'] / timings['bulk_upsert']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: seconds per video for each render engine (VIDEO_RENDERER).
+
+Renders the same synthetic script with every engine, without TTS (silent scenes
+of estimated narration length), so only compositing/encoding time is measured.
+Requires moviepy, ImageMagick and ffmpeg.
+
+Run from the backend folder:
+    python -m benchmarks.bench_video_render --scenes 10 --runs 2
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from services import video_maker
+
+_NARRATION = "هذه فقرة تجريبية لقياس سرعة إنشاء الفيديو من المشاهد الثابتة " * 4
+
+
+def _prepared(n: int):
+    return [(i, f"المشهد رقم {i + 1}", _NARRATION) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--engines", default=",".join(video_maker._RENDERERS))
+    args = parser.parse_args()
+
+    prepared = _prepared(args.scenes)
+    audio_paths = [None] * len(prepared)
+    results = {}
+    for engine in args.engines.split(","):
+        renderer = video_maker._RENDERERS[engine]
+        timings = []
+        for _ in range(args.runs):
+            temp_dir = tempfile.mkdtemp(prefix="p2v_bench_")
+            try:
+                output_path = os.path.join(temp_dir, "out.mp4")
+                start = time.perf_counter()
+                renderer(prepared, audio_paths, output_path, temp_dir)
+                timings.append(time.perf_counter() - start)
+                size = os.path.getsize(output_path)
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        results[engine] = (min(timings), size)
+
+    baseline = results.get("moviepy", (None,))[0]
+    for engine, (seconds, size) in results.items():
+        speedup = f"  {baseline / seconds:5.1f}x vs moviepy" if baseline else ""
+        print(f"{engine:10s} {seconds:8.2f}s per video ({args.scenes} scenes, {size / 1024:.0f} KiB){speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,9 @@ class Settings(BaseSettings):
     PORT: int = 8000
     WORKERS: int = 4
     
+    # Token required in X-Admin-Token for /admin routes and raised upload priority (unset: both disabled)
+    ADMIN_TOKEN: str = ""
+
     # CORS
     CORS_ORIGINS: str = "*"
     
@@ -22,9 +25,33 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "uploads"
     OUTPUT_DIR: str = "outputs"
     MAX_PDF_PAGES: int = 12
+    # Text extraction backend: "auto" uses the fastest installed of pypdfium2, pymupdf, pdfminer;
+    # any other backend falls back to pdfminer from the page where it failed
+    PDF_BACKEND: str = "auto"  # options: auto, pypdfium2, pymupdf, pdfminer
+    PDF_BACKEND_TIMEOUT: int = 60  # seconds a backend may spend on one document
+    # Page-sharded pdfminer extraction across processes (0 = min(4, CPU cores), 1 = in-process);
+    # the pool is per process, so under gunicorn with inline jobs the total is WORKERS times this
+    PDF_EXTRACT_WORKERS: int = 0
+    PDF_MIN_PAGES_PER_SHARD: int = 2  # smaller documents are not worth a process hop
+    # Result cache for /papers/upload (keyed on PDF hash + generation settings)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_AGE: int = 604800  # 7 days
+    OUTPUT_MAX_BYTES: int = 2147483648  # 2GB cap on OUTPUT_DIR artifacts
     # Arabic dialect preference for script generation
     ARABIC_DIALECT: str = "MSA"  # options: MSA, EGYPTIAN
 
+    # Video rendering engine: "moviepy" composites every frame in Python in one encode,
+    # "moviepy_segments" encodes each scene separately across render processes,
+    # "ffmpeg" renders each overlay once and encodes still-image segments directly
+    VIDEO_RENDERER: str = "moviepy"  # options: moviepy, moviepy_segments, ffmpeg
+    VIDEO_SLIDE_FPS: int = 2  # frame rate of still-image segments (ffmpeg renderer)
+    # Segment encoding processes per web worker or runner (0 = min(4, CPU cores)); the pool is per
+    # process, so under gunicorn with inline jobs the total is WORKERS times this
+    VIDEO_RENDER_WORKERS: int = 0
+    # Also publish scenes as an HLS playlist while rendering so playback can start early
+    VIDEO_HLS_ENABLED: bool = False
+    VIDEO_TIMEOUT: int = 300  # seconds for narrating and rendering one video
+
     # TTS Providers
     TTS_PROVIDER: str = "gtts"  # options: gtts, azure, elevenlabs
     # Azure Speech
@@ -34,6 +61,16 @@ class Settings(BaseSettings):
     # ElevenLabs
     ELEVENLABS_API_KEY: str = ""
     ELEVENLABS_VOICE_ID: str = ""  # Set a voice ID supporting Arabic
+    # Max concurrent synthesis requests per provider (scenes are synthesized in parallel)
+    TTS_CONCURRENCY_GTTS: int = 4
+    TTS_CONCURRENCY_AZURE: int = 8
+    TTS_CONCURRENCY_ELEVENLABS: int = 2
+    # Seconds for all narrations of one video (0 = half of VIDEO_TIMEOUT); later scenes render silent
+    TTS_TIMEOUT: int = 0
+    # Synthesized audio cache keyed on provider, voice, language and text
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_DIR: str = "cache/tts"
+    TTS_CACHE_MAX_BYTES: int = 536870912  # 512MB
     
     # Processing limits
     MAX_TEXT_LENGTH: int = 50000
@@ -41,6 +78,51 @@ class Settings(BaseSettings):
     
     # Gemini
     GEMINI_MODEL: str = "gemini-2.5-flash"
+    # Batched field classification (/trends/trending)
+    CLASSIFY_BATCH_MAX_ITEMS: int = 50
+    CLASSIFY_BATCH_MAX_CHARS: int = 64000  # ~16k tokens of paper text per prompt
+
+    # Local SQLite cache database shared by all workers
+    CACHE_DB_PATH: str = "cache/cache.db"
+    # arXiv feed cache (conditional GETs, stale-while-revalidate)
+    ARXIV_FEED_URL: str = "https://export.arxiv.org/rss/{category}"
+    ARXIV_FEED_TIMEOUT: float = 15.0  # seconds per feed request
+    FEED_CACHE_TTL: int = 900  # serve without revalidating for 15 minutes
+    FEED_CACHE_MAX_STALE: int = 86400  # serve stale while refreshing in background up to a day
+    # Gemini response cache (in-process LRU in front of CACHE_DB_PATH)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: int = 604800  # 7 days
+    LLM_CACHE_MEMORY_ENTRIES: int = 512
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    
+    # Job store: "sqlite" is shared by all gunicorn workers and survives restarts,
+    # "memory" only works with a single worker
+    JOB_STORE: str = "sqlite"  # options: sqlite, memory
+    JOB_STORE_PATH: str = "data/jobs.db"
+    # Retention of finished jobs: dropped after JOB_TTL, and least recently used ones first
+    # once there are more than JOB_MAX_ENTRIES jobs or they take more than JOB_MAX_BYTES
+    JOB_TTL: int = 86400
+    JOB_MAX_ENTRIES: int = 5000
+    JOB_MAX_BYTES: int = 104857600  # 100MB of stored (compressed) results
+    # "inline" runs jobs as background tasks in the web worker; "queue" hands them to
+    # `python worker.py` through a durable queue in JOB_STORE_PATH
+    JOB_RUNNER_MODE: str = "inline"  # options: inline, queue
+    JOB_RUNNER_CONCURRENCY: int = 2  # jobs processed at once per runner process
+    JOB_QUEUE_MAX: int = 20  # uploads beyond this many waiting/running jobs get 429
+    JOB_RETRY_AFTER: int = 60  # seconds per queued batch, used for the Retry-After hint
+    JOB_DRAIN_TIMEOUT: int = 300  # seconds a stopping runner waits for running jobs
+    JOB_CLAIM_LEASE: int = 120  # seconds a claim survives without renewal before other runners retake the job
+    # /papers/events/{job_id}: how often the job store is checked, and idle keep-alive interval
+    JOB_EVENTS_POLL_INTERVAL: float = 0.5
+    JOB_EVENTS_HEARTBEAT: int = 15
+
+    # Shared step executors (per step type thread limits, see services/executor.py)
+    EXECUTOR_PDF_WORKERS: int = 2
+    EXECUTOR_LLM_WORKERS: int = 16
+    EXECUTOR_RENDER_WORKERS: int = 2
+    EXECUTOR_TTS_WORKERS: int = 8
+    EXECUTOR_DEFAULT_WORKERS: int = 4
+    EXECUTOR_QUEUE_TIMEOUT: int = 600  # seconds a step may wait for a free worker
     
     # Logging
     LOG_LEVEL: str = "INFO"
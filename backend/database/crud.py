@@ -0,0 +1,74 @@
+from typing import Any, Dict, List
+from sqlalchemy.orm import Session
+from loguru import logger
+from .models import Trend
+
+# Keep each INSERT well under SQLite's bound-parameter limit (5 columns per row)
+_UPSERT_CHUNK = 150
+_TREND_COLUMNS = ("title", "summary", "field", "published_at")
+
+
+def upsert_trends(db: Session, rows: List[Dict[str, Any]], update_existing: bool = False) -> int:
+    """
+    Insert a batch of trends in a single transaction.
+    Rows are dicts with arxiv_id, title, summary, field and published_at. Existing arxiv_ids are
+    skipped, or overwritten when update_existing is set. Returns the number of rows written.
+    """
+    # Last row wins for duplicate ids; Postgres rejects one statement touching a key twice
+    deduped = {}
+    for row in rows:
+        if row.get("arxiv_id"):
+            deduped[row["arxiv_id"]] = {"arxiv_id": row["arxiv_id"], **{c: row.get(c) for c in _TREND_COLUMNS}}
+    rows = list(deduped.values())
+    if not rows:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    try:
+        if dialect in ("sqlite", "postgresql"):
+            written = _upsert_on_conflict(db, rows, dialect, update_existing)
+        else:
+            written = _upsert_generic(db, rows, update_existing)
+        db.commit()
+        return written
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _upsert_on_conflict(db: Session, rows: List[Dict[str, Any]], dialect: str, update_existing: bool) -> int:
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    written = 0
+    for start in range(0, len(rows), _UPSERT_CHUNK):
+        stmt = insert(Trend).values(rows[start:start + _UPSERT_CHUNK])
+        if update_existing:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Trend.arxiv_id],
+                set_={c: stmt.excluded[c] for c in _TREND_COLUMNS},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Trend.arxiv_id])
+        result = db.execute(stmt)
+        written += max(result.rowcount or 0, 0)
+    return written
+
+
+def _upsert_generic(db: Session, rows: List[Dict[str, Any]], update_existing: bool) -> int:
+    """Fallback for other dialects: one SELECT for existing ids, then ORM writes."""
+    ids = [r["arxiv_id"] for r in rows]
+    existing = {t.arxiv_id: t for t in db.query(Trend).filter(Trend.arxiv_id.in_(ids)).all()}
+    written = 0
+    for row in rows:
+        trend = existing.get(row["arxiv_id"])
+        if trend is None:
+            db.add(Trend(**row))
+            written += 1
+        elif update_existing:
+            for c in _TREND_COLUMNS:
+                setattr(trend, c, row[c])
+            written += 1
+    logger.debug(f"Generic trend upsert wrote {written} rows")
+    return written
@@ -1,12 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from routers import papers, classify, trends
+from routers import papers, classify, trends, admin
 import os
 from dotenv import load_dotenv
 from database.db import engine
 from database import models
 from config import settings
+from services.executor import get_metrics as get_executor_metrics, shutdown_executors
+from services.video_maker import shutdown_render_pool
+from services.pdf_parser import shutdown_pdf_pool
+from services.job_manager import enforce_job_retention
+from services import job_queue
 from loguru import logger
 import sys
 
@@ -62,12 +67,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 logger.info(f"CORS configured with origins: {cors_origins}")
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Refuse upload bodies over the size limit as they arrive, before the form is spooled: a declared
+    Content-Length is checked up front and chunked or unknown-length bodies are counted while read.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/papers/upload":
+            await self.app(scope, receive, send)
+            return
+        limit = papers.max_upload_body()
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"},
+            headers={"Connection": "close"},
+        )
+        declared = dict(scope["headers"]).get(b"content-length", b"").decode()
+        if declared.isdigit() and int(declared) > limit:
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Answer now and make the app see a disconnect so it stops reading
+                    rejected = True
+                    await response(scope, receive, send)
+            if rejected:
+                return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app answers after the 413 has gone out is dropped
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 logger.info(f"GEMINI_API_KEY configured: {'Yes' if settings.GEMINI_API_KEY else 'No'}")
 
 # Include routers
 app.include_router(papers.router, prefix="/papers", tags=["Papers"])
 app.include_router(classify.router, prefix="/classify", tags=["Classification"])
 app.include_router(trends.router, prefix="/trends", tags=["Trends"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 @app.get("/")
 def root():
@@ -85,11 +147,16 @@ def health_check():
         from sqlalchemy import text
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-        return {
+        health = {
             "status": "healthy",
             "database": "connected",
-            "gemini_configured": bool(settings.GEMINI_API_KEY)
+            "gemini_configured": bool(settings.GEMINI_API_KEY),
+            "executors": get_executor_metrics()
         }
+        if settings.JOB_RUNNER_MODE == "queue":
+            waiting, running = job_queue.depth()
+            health["job_queue"] = {"waiting": waiting, "running": running, "max": settings.JOB_QUEUE_MAX}
+        return health
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail="Service unhealthy")
@@ -111,9 +178,13 @@ def on_startup():
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     os.makedirs(settings.OUTPUT_DIR, exist_ok=True)
     os.makedirs("logs", exist_ok=True)
+    enforce_job_retention()
     logger.info("Application started successfully")
 
 @app.on_event("shutdown")
 def on_shutdown():
     logger.info("Shutting down Paper2Video API...")
+    shutdown_executors(wait=False)
+    shutdown_render_pool()
+    shutdown_pdf_pool()
 
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from services.job_manager import enforce_job_retention, get_store_stats
+from services.result_cache import get_stats as get_cache_stats
+from services import llm_cache
+from config import settings
+import secrets
+
+router = APIRouter()
+
+
+def is_admin(x_admin_token: str) -> bool:
+    """Whether the header carries the configured ADMIN_TOKEN; always False when none is set."""
+    return bool(settings.ADMIN_TOKEN) and secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: str = Header("")):
+    """Admin routes need a matching X-Admin-Token header and are closed while ADMIN_TOKEN is unset."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled (ADMIN_TOKEN is not set)")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/jobs/stats", dependencies=[Depends(require_admin)])
+async def job_store_stats():
+    """Job store size (entries and stored bytes by status), retention limits and eviction counters"""
+    return await run_in_threadpool(get_store_stats)
+
+
+@router.post("/jobs/evict", dependencies=[Depends(require_admin)])
+async def evict_jobs():
+    """Apply the job retention policy now instead of waiting for the next periodic run"""
+    evicted = await run_in_threadpool(enforce_job_retention)
+    return {"evicted": evicted, **(await run_in_threadpool(get_store_stats))}
+
+
+@router.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Result and LLM response cache counters plus output directory usage"""
+    return {**(await run_in_threadpool(get_cache_stats)), "llm": await run_in_threadpool(llm_cache.get_stats)}
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Body, HTTPException
-from services.gemini_service import classify_field_with_gemini
+from services.gemini_service import classify_field_with_gemini_async
 from loguru import logger
 
 router = APIRouter()
 
 @router.post("/field")
-def classify_field(text: str = Body("")):
+async def classify_field(text: str = Body("")):
     """
     Classify text into AI field categories using Gemini
     """
@@ -13,7 +13,7 @@ def classify_field(text: str = Body("")):
         if not text or len(text.strip()) < 10:
             raise HTTPException(status_code=400, detail="Text must be at least 10 characters")
         
-        field = classify_field_with_gemini(text)
+        field = await classify_field_with_gemini_async(text)
         return {"predicted_field": field}
     except HTTPException:
         raise
@@ -1,18 +1,76 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi import BackgroundTasks
-from fastapi.responses import FileResponse
-from services.pdf_parser import extract_text_from_pdf
-from services.gemini_service import summarize_with_gemini, segment_paper, generate_video_script, classify_field_with_gemini, extract_keywords, translate_text
-from services.video_maker import make_video_from_scenes
-from services.job_manager import create_job, set_status, set_result, set_error, get_job
+from fastapi import BackgroundTasks, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from services.gemini_service import translate_text_async
+from services.job_manager import create_job, set_result, set_error, get_job
+from services import job_queue
+from services.pipeline import process_paper_job
+from routers.admin import is_admin
+from services.result_cache import compute_cache_key, get_cached_result
 from config import settings
 from loguru import logger
 import os
 import uuid
+import asyncio
+import hashlib
+import json
+import re
+import time
 import magic
 
 router = APIRouter()
 
+# Video filenames carry a random id and are never rewritten, so clients may cache them for good
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_RANGE_CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Upload priorities are limited to [-_MAX_PRIORITY, _MAX_PRIORITY]
+_MAX_PRIORITY = 10
+# Multipart boundaries and part headers on top of the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def max_upload_body() -> int:
+    """Largest request body that can carry an upload within MAX_FILE_SIZE."""
+    return settings.MAX_FILE_SIZE + _MULTIPART_OVERHEAD
+
+
+def _file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
+    )
+
+
+def _stream_to_disk(src, dest_path: str) -> str:
+    """Copy an upload to dest_path in chunks, hashing as it goes; returns the SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    size = 0
+    part_path = dest_path + ".part"
+    try:
+        with open(part_path, "wb") as out:
+            while True:
+                chunk = src.read(_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.MAX_FILE_SIZE:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(part_path, dest_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return digest.hexdigest()
+
 def validate_pdf_file(file: UploadFile) -> None:
     """Validate uploaded file is a PDF"""
     if not file.filename:
@@ -30,8 +88,21 @@ def validate_pdf_file(file: UploadFile) -> None:
     if detected_type != 'application/pdf':
         raise HTTPException(status_code=400, detail=f"Invalid file type: {detected_type}")
 
+def _reject_busy(retry_after: int):
+    raise HTTPException(
+        status_code=429,
+        detail="Too many papers are being processed, please retry later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
 @router.post("/upload")
-async def upload_paper(file: UploadFile = File(...), background_tasks: BackgroundTasks = None):
+async def upload_paper(
+    file: UploadFile = File(...),
+    background_tasks: BackgroundTasks = None,
+    priority: int = Query(0, ge=-_MAX_PRIORITY, le=_MAX_PRIORITY),
+    x_admin_token: str = Header(""),
+):
     """
     Upload a research paper PDF and generate:
     - Summary
@@ -42,110 +113,61 @@ async def upload_paper(file: UploadFile = File(...), background_tasks: Backgroun
     """
     save_path = None
     video_path = None
+
+    # Anyone may yield to other jobs; only admins may jump the queue
+    if priority > 0 and not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Raising job priority requires an admin token")
     
     try:
         # Validate file
         validate_pdf_file(file)
         
-        # Check file size
-        file_content = await file.read()
-        if len(file_content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
-            )
-        
-        # Save file
+        # Stream to disk in chunks, hashing and enforcing the size limit as it arrives
         file_name = f"{uuid.uuid4()}.pdf"
         save_path = os.path.join(settings.UPLOAD_DIR, file_name)
         os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-        
-        with open(save_path, "wb") as f:
-            f.write(file_content)
+        try:
+            pdf_sha256 = await run_in_threadpool(_stream_to_disk, file.file, save_path)
+        except UploadTooLarge:
+            raise _file_too_large()
+
+        # Short-circuit identical uploads processed with the same settings
+        cache_key = compute_cache_key(pdf_sha256)
+        cached = await run_in_threadpool(get_cached_result, cache_key)
+        if cached is not None:
+            os.remove(save_path)
+            job_id = await run_in_threadpool(create_job)
+            await run_in_threadpool(set_result, job_id, cached)
+            logger.info(f"Served upload from result cache: job {job_id}")
+            return {"job_id": job_id, "cached": True}
+
+        # Cheap early rejection; enqueue() re-checks atomically
+        if settings.JOB_RUNNER_MODE == "queue":
+            waiting, running = await run_in_threadpool(job_queue.depth)
+            if waiting + running >= settings.JOB_QUEUE_MAX:
+                os.remove(save_path)
+                _reject_busy(job_queue.retry_after_seconds(waiting + running))
 
         logger.info(f"Queued PDF for processing: {file_name}")
 
         # Create job and enqueue background processing
-        job_id = create_job()
+        job_id = await run_in_threadpool(create_job)
 
-        def process_job():
+        if settings.JOB_RUNNER_MODE == "queue":
             try:
-                set_status(job_id, "processing", progress=5)
-
-                # Helper for timeouts
-                from concurrent.futures import ThreadPoolExecutor
-                import functools
-                def run_with_timeout(func, *f_args, timeout_sec: float = 60, default=None, **f_kwargs):
-                    try:
-                        with ThreadPoolExecutor(max_workers=1) as ex:
-                            fut = ex.submit(functools.partial(func, *f_args, **f_kwargs))
-                            return fut.result(timeout=timeout_sec)
-                    except Exception as e:
-                        logger.warning(f"Step '{getattr(func, '__name__', 'call')}' failed or timed out: {e}")
-                        return default
-
-                # Extract text with timeout
-                text = run_with_timeout(extract_text_from_pdf, save_path, timeout_sec=90, default="")
-                if not text or len(text.strip()) < 100:
-                    raise Exception("Could not extract sufficient text from PDF")
-                text = text[:settings.MAX_TEXT_LENGTH]
-                set_status(job_id, "processing", progress=20)
-
-                # Segment + script
-                sections = run_with_timeout(segment_paper, text[:8000], timeout_sec=90, default=None)
-                if not sections:
-                    sections = [{"title": "الملخص", "summary": "تم تلخيص الورقة لاحقاً بسبب قيود الوقت."}]
-                if len(sections) > settings.MAX_SECTIONS:
-                    sections = sections[:settings.MAX_SECTIONS]
-                set_status(job_id, "processing", progress=40)
-
-                script = run_with_timeout(generate_video_script, sections, timeout_sec=90, default=[])
-                if not script:
-                    script = [{"overlay": s.get("title", "مشهد"), "narration": s.get("summary", "")} for s in sections]
-                set_status(job_id, "processing", progress=55)
-
-                # Classify + keywords
-                field = run_with_timeout(classify_field_with_gemini, text[:3000], timeout_sec=30, default="Unknown")
-                keywords = run_with_timeout(extract_keywords, text[:3000], timeout_sec=20, default=[])
-                set_status(job_id, "processing", progress=65)
-
-                # Video
-                os.makedirs(settings.OUTPUT_DIR, exist_ok=True)
-                video_filename = f"video_{uuid.uuid4().hex}.mp4"
-                out_path = os.path.join(settings.OUTPUT_DIR, video_filename)
-                run_with_timeout(make_video_from_scenes, script, timeout_sec=300, default=None, output_path=out_path)
-                set_status(job_id, "processing", progress=85)
-
-                # Summary
-                summary = run_with_timeout(summarize_with_gemini, text[:3000], timeout_sec=90, default="")
-                set_status(job_id, "processing", progress=95)
-
-                result = {
-                    "summary": summary,
-                    "field": field,
-                    "keywords": keywords,
-                    "sections": sections,
-                    "script": script,
-                    "video_filename": video_filename,
-                    "video_url": f"/papers/video/{video_filename}"
-                }
-                set_result(job_id, result)
-            except Exception as e:
-                logger.error(f"Job {job_id} failed: {e}")
-                set_error(job_id, str(e))
-            finally:
-                # Cleanup uploaded file
-                try:
-                    if save_path and os.path.exists(save_path):
-                        os.remove(save_path)
-                except Exception as ce:
-                    logger.warning(f"Could not remove temp file: {ce}")
-
-        if background_tasks is not None:
-            background_tasks.add_task(process_job)
+                await run_in_threadpool(
+                    job_queue.enqueue, job_id, {"save_path": save_path, "cache_key": cache_key}, priority=priority
+                )
+            except job_queue.QueueFull as e:
+                await run_in_threadpool(set_error, job_id, "Rejected: job queue is full")
+                os.remove(save_path)
+                _reject_busy(e.retry_after)
         else:
-            import threading
-            threading.Thread(target=process_job, daemon=True).start()
+            if background_tasks is not None:
+                background_tasks.add_task(process_paper_job, job_id, save_path, cache_key)
+            else:
+                import threading
+                threading.Thread(target=process_paper_job, args=(job_id, save_path, cache_key), daemon=True).start()
 
         return {"job_id": job_id}
 
@@ -158,26 +180,113 @@ async def upload_paper(file: UploadFile = File(...), background_tasks: Backgroun
         # Do not delete here; background process cleans it after finishing
         pass
 
-@router.get("/video/{filename}")
-async def get_video(filename: str):
-    """Serve generated video files"""
+def _strong_etag(stat: os.stat_result, filename: str) -> str:
+    digest = hashlib.sha1(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _parse_range(header: str, size: int):
+    """Return (start, end) inclusive for a single byte range, None to serve the whole file,
+    or raise 416 when the range cannot be satisfied. Multi-range requests and invalid ranges
+    (last byte before the first) are ignored and get the whole file, as RFC 9110 requires."""
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(_RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _media_response(request: Request, path: str, media_type: str, cache_control: str):
+    """Serve a file with a strong ETag, conditional GET (304) and single byte-range (206) support."""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = _strong_etag(stat, os.path.basename(path))
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range validator means the client's partial copy is outdated: send everything
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        if request.method == "HEAD":
+            return Response(status_code=200, headers=headers, media_type=media_type)
+        return StreamingResponse(_iter_file(path, 0, size), headers=headers, media_type=media_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=206, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_file(path, start, length), status_code=206, headers=headers, media_type=media_type)
+
+
+@router.api_route("/video/{filename}", methods=["GET", "HEAD"])
+async def get_video(filename: str, request: Request):
+    """Serve generated video files with byte-range and cache validation support"""
+    if os.path.basename(filename) != filename or not filename.endswith('.mp4'):
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    if filename.endswith('.part.mp4'):
+        # Still being rendered; only finished files are served (and cached as immutable)
+        raise HTTPException(status_code=404, detail="Video not found")
+
     video_path = os.path.join(settings.OUTPUT_DIR, filename)
-    
     if not os.path.exists(video_path):
         raise HTTPException(status_code=404, detail="Video not found")
-    
-    if not filename.endswith('.mp4'):
+
+    return _media_response(request, video_path, "video/mp4", _IMMUTABLE_CACHE_CONTROL)
+
+
+@router.api_route("/video/{stream}/{filename}", methods=["GET", "HEAD"])
+async def get_video_stream(stream: str, filename: str, request: Request):
+    """Serve the HLS playlist and segments of a video; available while it is still rendering"""
+    if not stream.startswith("hls_") or os.path.basename(stream) != stream or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Invalid stream path")
+    if not (filename.endswith(".m3u8") or filename.endswith(".ts")):
         raise HTTPException(status_code=400, detail="Invalid file type")
-    
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        filename=filename
-    )
+
+    path = os.path.join(settings.OUTPUT_DIR, stream, filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Stream not found")
+    if filename.endswith(".m3u8"):
+        # The playlist grows while rendering, so players must re-fetch it
+        return FileResponse(path, media_type="application/vnd.apple.mpegurl", headers={"Cache-Control": "no-cache"})
+    return _media_response(request, path, "video/mp2t", _IMMUTABLE_CACHE_CONTROL)
 
 
 @router.get("/status/{job_id}")
-async def get_status(job_id: str):
+def get_status(job_id: str):
     """Poll job status and result if available"""
     job = get_job(job_id)
     if not job or job.get("status") == "not_found":
@@ -185,13 +294,68 @@ async def get_status(job_id: str):
     return job
 
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/events/{job_id}")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of a job: "progress" on status/progress changes, "partial" with
+    each stage's output as it is produced, then one "done" (with the result) or "error" event.
+    """
+    if (await run_in_threadpool(get_job, job_id)).get("status") == "not_found":
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        last_progress = None
+        sent_partial = {}
+        last_sent = time.monotonic()
+        # The job may run in another worker or the job runner, so watch the shared store
+        while not await request.is_disconnected():
+            job = await run_in_threadpool(get_job, job_id)
+            status = job.get("status")
+            if status == "not_found":
+                yield _sse("error", {"error": "Job not found"})
+                return
+            chunks = []
+            progress = (status, job.get("progress"))
+            if progress != last_progress:
+                last_progress = progress
+                chunks.append(_sse("progress", {"status": status, "progress": job.get("progress")}))
+            changed = {k: v for k, v in (job.get("partial") or {}).items() if sent_partial.get(k) != v}
+            if changed:
+                sent_partial.update(changed)
+                chunks.append(_sse("partial", changed))
+            if status == "done":
+                chunks.append(_sse("done", job.get("result")))
+            elif status == "error":
+                chunks.append(_sse("error", {"error": job.get("error")}))
+            if chunks:
+                last_sent = time.monotonic()
+                yield "".join(chunks)
+            elif time.monotonic() - last_sent >= settings.JOB_EVENTS_HEARTBEAT:
+                # Comment line keeps proxies from closing an idle connection
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            if status in ("done", "error"):
+                return
+            await asyncio.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/translate")
 async def translate(text: str = "", target_language: str = "English"):
     """Translate arbitrary text to a target language using Gemini"""
     try:
         if not text or len(text.strip()) < 1:
             raise HTTPException(status_code=400, detail="Text cannot be empty")
-        translated = translate_text(text, target_language)
+        translated = await translate_text_async(text, target_language)
         return {"translated": translated, "target_language": target_language}
     except HTTPException:
         raise
@@ -1,52 +1,78 @@
 from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-from services.arxiv_service import fetch_trending
-from services.gemini_service import classify_field_with_gemini
+from services.arxiv_service import fetch_trending, fetch_trending_multi
+from services.gemini_service import classify_fields_batch_async
 from database.db import get_db
 from database.models import Trend
+from database.crud import upsert_trends
 from loguru import logger
 
 router = APIRouter()
 
 @router.get("/trending")
-def trending(category: str = Query("cs.LG"), limit: int = Query(10, ge=1, le=50), db=Depends(get_db)):
+async def trending(category: str = Query("cs.LG"), limit: int = Query(10, ge=1, le=50), db=Depends(get_db)):
     """
-    Fetch trending papers from arXiv and classify them by AI field
+    Fetch trending papers from arXiv and classify them by AI field.
+    Pass several comma-separated categories (e.g. cs.LG,cs.CL,cs.CV) to merge their feeds.
     """
     try:
         logger.info(f"Fetching trending papers: category={category}, limit={limit}")
-        items = fetch_trending(category=category, max_results=limit)
+        categories = list(dict.fromkeys(c.strip() for c in category.split(",") if c.strip()))
+        if len(categories) > 1:
+            items = await run_in_threadpool(fetch_trending_multi, categories, max_results=limit)
+        else:
+            items = await run_in_threadpool(fetch_trending, category=categories[0] if categories else "cs.LG", max_results=limit)
         
         if not items:
             return {"items": [], "message": "No trending papers found"}
         
-        # Classify into AI fields and optionally upsert into DB
-        results = []
-        for it in items:
+        # Reuse stored fields for papers we have already classified
+        known = {}
+        arxiv_ids = [it["arxiv_id"] for it in items if it.get("arxiv_id")]
+        if arxiv_ids:
             try:
-                field = classify_field_with_gemini(f"{it['title']}\n{it['summary']}")
-                results.append({**it, "field": field})
-                
-                # Upsert by arxiv_id if available
-                if it.get("arxiv_id"):
-                    try:
-                        existing = db.query(Trend).filter(Trend.arxiv_id == it["arxiv_id"]).first()
-                        if not existing:
-                            db.add(Trend(
-                                arxiv_id=it["arxiv_id"],
-                                title=it["title"],
-                                summary=it["summary"],
-                                field=field,
-                                published_at=it.get("published", "")
-                            ))
-                            db.commit()
-                    except Exception as e:
-                        logger.warning(f"Could not save trend to DB: {e}")
-                        db.rollback()
+                rows = await run_in_threadpool(
+                    lambda: db.query(Trend.arxiv_id, Trend.field).filter(Trend.arxiv_id.in_(arxiv_ids)).all()
+                )
+                known = {arxiv_id: field for arxiv_id, field in rows if field}
             except Exception as e:
-                logger.warning(f"Error classifying paper {it.get('title', 'unknown')}: {e}")
+                logger.warning(f"Could not look up stored trends: {e}")
+        new_positions = [i for i, it in enumerate(items) if it.get("arxiv_id") not in known]
+        logger.info(f"Trending: {len(items) - len(new_positions)} already classified, {len(new_positions)} new")
+
+        # Classify only new items, in as few batched prompts as possible
+        new_fields = {}
+        if new_positions:
+            texts = [f"{items[i]['title']}\n{items[i]['summary']}" for i in new_positions]
+            try:
+                fields = await classify_fields_batch_async(texts)
+            except Exception as e:
+                logger.warning(f"Error classifying trending papers: {e}")
                 # Include without classification
-                results.append({**it, "field": "Unknown"})
+                fields = ["Unknown"] * len(new_positions)
+            new_fields = dict(zip(new_positions, fields))
+
+        results = []
+        to_store = []
+        for i, it in enumerate(items):
+            field = new_fields[i] if i in new_fields else known[it["arxiv_id"]]
+            results.append({**it, "field": field})
+            if i in new_fields and it.get("arxiv_id") and field != "Unknown":
+                to_store.append({
+                    "arxiv_id": it["arxiv_id"],
+                    "title": it["title"],
+                    "summary": it["summary"],
+                    "field": field,
+                    "published_at": it.get("published", "")
+                })
+
+        # Store newly classified papers in one transaction
+        if to_store:
+            try:
+                await run_in_threadpool(upsert_trends, db, to_store, update_existing=True)
+            except Exception as e:
+                logger.warning(f"Could not save trends to DB: {e}")
         
         return {"items": results, "count": len(results)}
         
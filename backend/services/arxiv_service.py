@@ -1,46 +1,188 @@
+import json
+import time
 import feedparser
-from typing import List, Dict
+import httpx
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional
 from loguru import logger
+from config import settings
+from services.local_store import get_connection
+from services.executor import submit, abandon
 
 # Fetch trending AI papers from arXiv via RSS (recent submissions)
 # Users can filter by category e.g., cs.CL, cs.CV, cs.LG
+#
+# Parsed feeds are cached per category in CACHE_DB_PATH so every worker shares them.
+# Fresh entries are served directly; stale ones are served while a single background
+# refresh (claimed through a lease row) revalidates with ETag/Last-Modified.
+
+# Seconds a worker holds the refresh lease for a category
+_REFRESH_LEASE = 60
+
+_initialized = False
+
+
+def _conn():
+    global _initialized
+    conn = get_connection(settings.CACHE_DB_PATH)
+    if not _initialized:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_cache ("
+            "category TEXT PRIMARY KEY, entries TEXT NOT NULL, etag TEXT, modified TEXT, "
+            "fetched_at REAL NOT NULL, refresh_lease REAL NOT NULL DEFAULT 0)"
+        )
+        _initialized = True
+    return conn
+
+
+def _load(category: str) -> Optional[Dict]:
+    row = _conn().execute(
+        "SELECT entries, etag, modified, fetched_at FROM feed_cache WHERE category = ?", (category,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {"entries": json.loads(row[0]), "etag": row[1], "modified": row[2], "fetched_at": row[3]}
+
+
+def _claim_refresh(category: str) -> bool:
+    """Take the refresh lease for a category; False if another worker holds it."""
+    now = time.time()
+    cur = _conn().execute(
+        "UPDATE feed_cache SET refresh_lease = ? WHERE category = ? AND refresh_lease < ?",
+        (now + _REFRESH_LEASE, category, now),
+    )
+    return cur.rowcount == 1
+
+
+def _parse_entries(feed) -> List[Dict[str, str]]:
+    results: List[Dict[str, str]] = []
+    for entry in feed.entries or []:
+        # Extract arxiv ID from link or id
+        arxiv_id = ""
+        if entry.get("id"):
+            arxiv_id = entry["id"].split("/")[-1]
+        elif entry.get("link"):
+            arxiv_id = entry["link"].split("/")[-1]
+        
+        results.append({
+            "arxiv_id": arxiv_id,
+            "title": entry.get("title", "").strip(),
+            "summary": entry.get("summary", "").strip(),
+            "published": entry.get("published", ""),
+            "link": entry.get("link", ""),
+        })
+    return results
+
+
+def _refresh(category: str, cached: Optional[Dict]) -> List[Dict[str, str]]:
+    """Revalidate the feed with a conditional GET and store the outcome."""
+    url = settings.ARXIV_FEED_URL.format(category=category)
+    logger.debug(f"Fetching from arXiv: {url}")
+    
+    # feedparser has no socket timeout of its own, so fetch with httpx and parse the bytes
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("modified"):
+        headers["If-Modified-Since"] = cached["modified"]
+    response = httpx.get(url, headers=headers, timeout=settings.ARXIV_FEED_TIMEOUT, follow_redirects=True)
+    now = time.time()
+    conn = _conn()
+    
+    if cached and response.status_code == 304:
+        logger.debug(f"arXiv feed {category} not modified")
+        conn.execute("UPDATE feed_cache SET fetched_at = ?, refresh_lease = 0 WHERE category = ?", (now, category))
+        return cached["entries"]
+    response.raise_for_status()
+    
+    feed = feedparser.parse(response.content)
+    if feed.bozo and feed.bozo_exception:
+        logger.warning(f"Feed parsing warning: {feed.bozo_exception}")
+    
+    entries = _parse_entries(feed)
+    if not entries:
+        # Keep serving the last good copy (or nothing) rather than caching an empty/broken response
+        if cached:
+            conn.execute("UPDATE feed_cache SET refresh_lease = 0 WHERE category = ?", (category,))
+            return cached["entries"]
+        return []
+    
+    conn.execute(
+        "INSERT OR REPLACE INTO feed_cache (category, entries, etag, modified, fetched_at, refresh_lease) "
+        "VALUES (?, ?, ?, ?, ?, 0)",
+        (category, json.dumps(entries, ensure_ascii=False), response.headers.get("etag"),
+         response.headers.get("last-modified"), now),
+    )
+    logger.info(f"Fetched {len(entries)} papers from arXiv ({category})")
+    return entries
+
+
+def _background_refresh(category: str, cached: Dict):
+    try:
+        _refresh(category, cached)
+    except Exception as e:
+        logger.warning(f"Background refresh of arXiv feed {category} failed: {e}")
+        # Release the lease so the next stale read tries again
+        _conn().execute("UPDATE feed_cache SET refresh_lease = 0 WHERE category = ?", (category,))
+
 
 def fetch_trending(category: str = "cs.LG", max_results: int = 10) -> List[Dict[str, str]]:
     """
     Fetch trending papers from arXiv RSS feed
     """
     try:
-        url = f"https://export.arxiv.org/rss/{category}"
-        logger.debug(f"Fetching from arXiv: {url}")
-        
-        # Parse RSS feed
-        feed = feedparser.parse(url)
-        
-        if feed.bozo and feed.bozo_exception:
-            logger.warning(f"Feed parsing warning: {feed.bozo_exception}")
-        
-        results: List[Dict[str, str]] = []
-        entries = feed.entries[:max_results] if feed.entries else []
+        cached = None
+        try:
+            cached = _load(category)
+        except Exception as e:
+            logger.warning(f"Feed cache unavailable: {e}")
         
-        for entry in entries:
-            # Extract arxiv ID from link or id
-            arxiv_id = ""
-            if entry.get("id"):
-                arxiv_id = entry["id"].split("/")[-1]
-            elif entry.get("link"):
-                arxiv_id = entry["link"].split("/")[-1]
-            
-            results.append({
-                "arxiv_id": arxiv_id,
-                "title": entry.get("title", "").strip(),
-                "summary": entry.get("summary", "").strip(),
-                "published": entry.get("published", ""),
-                "link": entry.get("link", ""),
-            })
+        if cached:
+            age = time.time() - cached["fetched_at"]
+            if age < settings.FEED_CACHE_TTL:
+                return cached["entries"][:max_results]
+            if age < settings.FEED_CACHE_MAX_STALE:
+                # Stale-while-revalidate: one worker refreshes, everyone serves the cached copy
+                if _claim_refresh(category):
+                    submit("feeds", _background_refresh, category, cached)
+                return cached["entries"][:max_results]
         
-        logger.info(f"Fetched {len(results)} papers from arXiv")
-        return results
+        return _refresh(category, cached)[:max_results]
         
     except Exception as e:
         logger.error(f"Error fetching from arXiv: {e}", exc_info=True)
+        if cached:
+            return cached["entries"][:max_results]
         return []
+
+
+def _published_key(item: Dict[str, str]) -> datetime:
+    """Publication time as aware UTC; dates with "-0000" or no zone parse naive and are taken as UTC."""
+    try:
+        published = parsedate_to_datetime(item.get("published", ""))
+    except Exception:
+        published = datetime.min
+    return published.replace(tzinfo=timezone.utc) if published.tzinfo is None else published
+
+
+def fetch_trending_multi(categories: List[str], max_results: int = 10) -> List[Dict[str, str]]:
+    """
+    Fetch several category feeds concurrently, drop cross-listed duplicates by arxiv ID
+    and return the newest max_results papers across all of them.
+    """
+    futures = [(c, submit("feeds", fetch_trending, category=c, max_results=max_results)) for c in categories]
+    merged: Dict[str, Dict[str, str]] = {}
+    for category, fut in futures:
+        try:
+            items = fut.result(timeout=60)
+        except Exception as e:
+            abandon(fut)
+            logger.warning(f"Could not fetch arXiv feed {category}: {e}")
+            continue
+        for item in items:
+            key = item.get("arxiv_id") or item.get("link") or item.get("title")
+            merged.setdefault(key, item)
+    results = sorted(merged.values(), key=_published_key, reverse=True)
+    logger.info(f"Merged {len(results)} unique papers from {len(categories)} categories")
+    return results[:max_results]
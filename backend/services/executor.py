@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from config import settings
+
+# Process-wide thread pools, one per step type, so bursts of uploads share bounded capacity
+_POOLS: Dict[str, ThreadPoolExecutor] = {}
+_METRICS: Dict[str, Dict[str, int]] = {}
+_LOCK = threading.Lock()
+
+
+def _pool_size(name: str) -> int:
+    sizes = {
+        "pdf": settings.EXECUTOR_PDF_WORKERS,
+        "llm": settings.EXECUTOR_LLM_WORKERS,
+        "render": settings.EXECUTOR_RENDER_WORKERS,
+        "tts": settings.EXECUTOR_TTS_WORKERS,
+    }
+    return max(1, sizes.get(name, settings.EXECUTOR_DEFAULT_WORKERS))
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Return the shared pool for a step type, creating it on first use."""
+    with _LOCK:
+        pool = _POOLS.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=_pool_size(name), thread_name_prefix=f"p2v-{name}")
+            _POOLS[name] = pool
+            _METRICS[name] = {
+                "submitted": 0, "queued": 0, "running": 0, "completed": 0,
+                "failed": 0, "cancelled": 0, "abandoned": 0, "abandoned_running": 0,
+            }
+        return pool
+
+
+def submit(pool: str, func: Callable, *args, **kwargs) -> Future:
+    """
+    Submit work to a named pool.
+    The returned future carries task_state["started_at"] (monotonic) once a worker picks it up.
+    """
+    executor = get_executor(pool)
+    state: Dict[str, Any] = {"started_at": None, "finished": False, "abandoned": False}
+    metrics = _METRICS[pool]
+
+    def run():
+        with _LOCK:
+            metrics["queued"] -= 1
+            metrics["running"] += 1
+        state["started_at"] = time.monotonic()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with _LOCK:
+                state["finished"] = True
+                metrics["running"] -= 1
+                metrics["completed" if ok else "failed"] += 1
+                if state["abandoned"]:
+                    metrics["abandoned_running"] -= 1
+
+    with _LOCK:
+        metrics["submitted"] += 1
+        metrics["queued"] += 1
+    fut = executor.submit(run)
+    fut.task_state = state
+    fut.pool_name = pool
+    return fut
+
+
+def abandon(fut: Future) -> bool:
+    """
+    Stop waiting for a future. Queued work is cancelled outright; work already running
+    cannot be interrupted, so it is counted as abandoned until its thread frees up.
+    Returns True if the work was cancelled before it started.
+    """
+    metrics = _METRICS.get(getattr(fut, "pool_name", ""), None)
+    if fut.cancel():
+        if metrics is not None:
+            with _LOCK:
+                metrics["queued"] -= 1
+                metrics["cancelled"] += 1
+        return True
+    state = getattr(fut, "task_state", None)
+    if metrics is not None and state is not None:
+        with _LOCK:
+            if not state["abandoned"] and not state["finished"]:
+                state["abandoned"] = True
+                metrics["abandoned"] += 1
+                metrics["abandoned_running"] += 1
+    return False
+
+
+def get_metrics() -> Dict[str, Dict[str, int]]:
+    """Per-pool counters: queue depth, running, completed/failed, cancelled and abandoned tasks."""
+    with _LOCK:
+        return {name: {"max_workers": _pool_size(name), **m} for name, m in _METRICS.items()}
+
+
+def shutdown_executors(wait: bool = False):
+    with _LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
@@ -1,8 +1,11 @@
 import google.generativeai as genai
+import asyncio
+import json
 import os
 from typing import List, Dict
 from config import settings
 from loguru import logger
+from services import llm_cache
 
 api_key = settings.GEMINI_API_KEY or os.getenv("GOOGLE_API_KEY")
 if not api_key:
@@ -53,17 +56,43 @@ def _get_model(model_name: str = None):
             logger.info(f"Using Gemini model: {_resolved_model_name} (from {base})")
     return genai.GenerativeModel(_resolved_model_name)
 
-def summarize_with_gemini(text: str) -> str:
+def _generate_text(prompt: str, namespace: str) -> str:
     """
-    Generate a smart summary of research paper text using Gemini API
-    Returns Arabic summary
+    Call generate_content through the response cache.
+    namespace identifies the calling function so identical prompts never collide across tasks.
+    Returns "" when the model produced no text.
     """
-    try:
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not configured")
-        
-        model = _get_model()
-        prompt = f"""You are an intelligent academic assistant. Summarize the following research paper text in Arabic in a clear and organized manner:
+    model = _get_model()
+    key = llm_cache.make_key(_resolved_model_name or settings.GEMINI_MODEL, namespace, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    response = model.generate_content(prompt)
+    text = response.text if response and getattr(response, "text", None) else ""
+    if text:
+        llm_cache.put(key, text)
+    return text
+
+async def _generate_text_async(prompt: str, namespace: str) -> str:
+    """Async counterpart of _generate_text using the SDK's generate_content_async."""
+    if not _resolved_model_name:
+        # Model resolution lists models over the network; keep it off the event loop
+        await asyncio.to_thread(_get_model)
+    model = _get_model()
+    key = llm_cache.make_key(_resolved_model_name or settings.GEMINI_MODEL, namespace, prompt)
+    # The disk tier reads SQLite and may wait on another worker's write lock
+    cached = await asyncio.to_thread(llm_cache.get, key)
+    if cached is not None:
+        return cached
+    response = await model.generate_content_async(prompt)
+    text = response.text if response and getattr(response, "text", None) else ""
+    if text:
+        # Disk-tier writes may wait on the SQLite lock; don't stall the loop
+        await asyncio.to_thread(llm_cache.put, key, text)
+    return text
+
+def _summary_prompt(text: str) -> str:
+    return f"""You are an intelligent academic assistant. Summarize the following research paper text in Arabic in a clear and organized manner:
         - Introduction
         - Problem
         - Methodology
@@ -75,21 +104,44 @@ def summarize_with_gemini(text: str) -> str:
         Text:
         {text}
         """
-        response = model.generate_content(prompt)
-        result = response.text if response and getattr(response, "text", None) else "No summary generated."
+
+def summarize_with_gemini(text: str) -> str:
+    """
+    Generate a smart summary of research paper text using Gemini API
+    Returns Arabic summary
+    """
+    try:
+        if not settings.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not configured")
+        
+        result = _generate_text(_summary_prompt(text), "summarize") or "No summary generated."
         logger.debug("Summary generated successfully")
         return result
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
         raise
 
-def segment_paper(text: str) -> List[Dict[str, str]]:
-    """
-    Segment paper into logical sections with simple explanation for each section
-    Returns: List of {"title": str, "summary": str} - all in Arabic
-    """
-    model = _get_model()
-    prompt = f"""Divide the following research paper text into main sections. For each section provide:
+async def summarize_with_gemini_async(text: str) -> str:
+    """Async variant of summarize_with_gemini"""
+    try:
+        if not settings.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not configured")
+        
+        result = await _generate_text_async(_summary_prompt(text), "summarize") or "No summary generated."
+        logger.debug("Summary generated successfully")
+        return result
+    except Exception as e:
+        logger.error(f"Error generating summary: {e}")
+        raise
+
+def _segment_prompt(text: str, outlined: bool = False) -> str:
+    if outlined:
+        task = """The following research paper has already been split into its sections: each starts with a
+    "## " heading line followed by an excerpt from that section. Keep the sections in order, merging
+    only very short ones. For each section provide:"""
+    else:
+        task = "Divide the following research paper text into main sections. For each section provide:"
+    return f"""{task}
     - A short title (in Arabic)
     - A simple summary in Arabic for general audience
     
@@ -99,10 +151,10 @@ def segment_paper(text: str) -> List[Dict[str, str]]:
     Text:
     {text}
     """
-    response = model.generate_content(prompt)
-    content = response.text if response and getattr(response, "text", None) else "[]"
+
+def _parse_sections(content: str):
+    """Parse the segmentation JSON; None if the model did not return a list."""
     try:
-        import json
         sections = json.loads(content)
         if isinstance(sections, list):
             normalized = []
@@ -113,21 +165,40 @@ def segment_paper(text: str) -> List[Dict[str, str]]:
             return normalized
     except Exception:
         pass
+    return None
+
+def segment_paper(text: str, outlined: bool = False) -> List[Dict[str, str]]:
+    """
+    Segment paper into logical sections with simple explanation for each section.
+    outlined=True means text is a section digest ("## title" + excerpt per section).
+    Returns: List of {"title": str, "summary": str} - all in Arabic
+    """
+    content = _generate_text(_segment_prompt(text, outlined), "segment") or "[]"
+    sections = _parse_sections(content)
+    if sections is not None:
+        return sections
     return [{"title": "Overall", "summary": summarize_with_gemini(text)}]
 
-def classify_field_with_gemini(text: str) -> str:
-    """Classify paper into AI field categories (NLP, CV, RL, etc.)"""
-    model = _get_model()
-    fields = [
-        "Natural Language Processing (NLP)",
-        "Computer Vision",
-        "Reinforcement Learning",
-        "Speech Processing",
-        "Robotics",
-        "Machine Learning Theory",
-    ]
-    constraint = ", ".join(fields)
-    prompt = f"""From the following text, determine the most suitable field from these options only:
+async def segment_paper_async(text: str, outlined: bool = False) -> List[Dict[str, str]]:
+    """Async variant of segment_paper"""
+    content = await _generate_text_async(_segment_prompt(text, outlined), "segment") or "[]"
+    sections = _parse_sections(content)
+    if sections is not None:
+        return sections
+    return [{"title": "Overall", "summary": await summarize_with_gemini_async(text)}]
+
+FIELDS = [
+    "Natural Language Processing (NLP)",
+    "Computer Vision",
+    "Reinforcement Learning",
+    "Speech Processing",
+    "Robotics",
+    "Machine Learning Theory",
+]
+
+def _classify_prompt(text: str) -> str:
+    constraint = ", ".join(FIELDS)
+    return f"""From the following text, determine the most suitable field from these options only:
     {constraint}
     
     Return only the field name without any explanation.
@@ -135,26 +206,132 @@ def classify_field_with_gemini(text: str) -> str:
     Text:
     {text}
     """
-    response = model.generate_content(prompt)
-    raw = response.text.strip() if response and getattr(response, "text", None) else ""
-    for f in fields:
+
+def _match_field(raw: str) -> str:
+    for f in FIELDS:
         if f.lower() in raw.lower():
             return f
-    return fields[0]
+    return FIELDS[0]
 
-def generate_video_script(sections: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def classify_field_with_gemini(text: str) -> str:
+    """Classify paper into AI field categories (NLP, CV, RL, etc.)"""
+    raw = _generate_text(_classify_prompt(text), "classify").strip()
+    return _match_field(raw)
+
+async def classify_field_with_gemini_async(text: str) -> str:
+    """Async variant of classify_field_with_gemini"""
+    raw = (await _generate_text_async(_classify_prompt(text), "classify")).strip()
+    return _match_field(raw)
+
+# Per-item cap inside batched prompts; a title plus abstract rarely exceeds this
+_BATCH_ITEM_CHARS = 2000
+
+def _batch_chunks(texts: List[str]) -> List[List[int]]:
+    """Group item indices so each prompt stays under the item and character budgets."""
+    chunks, current, size = [], [], 0
+    for i, t in enumerate(texts):
+        n = min(len(t), _BATCH_ITEM_CHARS)
+        if current and (len(current) >= settings.CLASSIFY_BATCH_MAX_ITEMS or size + n > settings.CLASSIFY_BATCH_MAX_CHARS):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _classify_batch_prompt(texts: List[str], indices: List[int]) -> str:
+    constraint = ", ".join(FIELDS)
+    papers = json.dumps([{"id": i, "text": texts[i][:_BATCH_ITEM_CHARS]} for i in indices], ensure_ascii=False)
+    return f"""For each paper below, determine the most suitable field from these options only:
+    {constraint}
+    
+    Return the result as a JSON list with one element per paper containing only the keys "id" and "field".
+    Use the paper ids exactly as given.
+    
+    Papers:
+    {papers}
     """
-    Generate video script: for each section -> narration text (Arabic) and on-screen text (overlay)
-    Returns list of scenes: {"overlay": str, "narration": str} - all in Arabic
+
+def _parse_batch_fields(content: str, indices: List[int]) -> Dict[int, str]:
+    """Map item index -> field for every well-formed entry; missing ids are left out."""
+    # Tolerate markdown code fences or prose around the JSON list
+    start, end = content.find("["), content.rfind("]")
+    if start != -1 and end > start:
+        content = content[start:end + 1]
+    try:
+        entries = json.loads(content)
+    except Exception:
+        return {}
+    wanted = set(indices)
+    fields = {}
+    if isinstance(entries, list):
+        for entry in entries:
+            try:
+                idx = int(entry.get("id"))
+            except Exception:
+                continue
+            raw = str(entry.get("field") or "")
+            if idx in wanted and any(f.lower() in raw.lower() for f in FIELDS):
+                fields[idx] = _match_field(raw)
+    return fields
+
+def classify_fields_batch(texts: List[str]) -> List[str]:
     """
-    model = _get_model()
+    Classify many texts with one prompt per chunk.
+    Items the batch response misses are classified individually.
+    """
+    results: Dict[int, str] = {}
+    for indices in _batch_chunks(texts):
+        try:
+            content = _generate_text(_classify_batch_prompt(texts, indices), "classify_batch")
+            results.update(_parse_batch_fields(content, indices))
+        except Exception as e:
+            logger.warning(f"Batch classification failed for {len(indices)} items: {e}")
+    missing = [i for i in range(len(texts)) if i not in results]
+    if missing:
+        logger.info(f"Falling back to per-item classification for {len(missing)} of {len(texts)} items")
+    for i in missing:
+        try:
+            results[i] = classify_field_with_gemini(texts[i])
+        except Exception as e:
+            logger.warning(f"Error classifying item {i}: {e}")
+            results[i] = "Unknown"
+    return [results[i] for i in range(len(texts))]
+
+async def classify_fields_batch_async(texts: List[str]) -> List[str]:
+    """Async variant of classify_fields_batch; chunks and fallbacks run concurrently."""
+    results: Dict[int, str] = {}
+
+    async def run_chunk(indices: List[int]):
+        try:
+            content = await _generate_text_async(_classify_batch_prompt(texts, indices), "classify_batch")
+            results.update(_parse_batch_fields(content, indices))
+        except Exception as e:
+            logger.warning(f"Batch classification failed for {len(indices)} items: {e}")
+
+    async def run_single(i: int):
+        try:
+            results[i] = await classify_field_with_gemini_async(texts[i])
+        except Exception as e:
+            logger.warning(f"Error classifying item {i}: {e}")
+            results[i] = "Unknown"
+
+    await asyncio.gather(*(run_chunk(indices) for indices in _batch_chunks(texts)))
+    missing = [i for i in range(len(texts)) if i not in results]
+    if missing:
+        logger.info(f"Falling back to per-item classification for {len(missing)} of {len(texts)} items")
+        await asyncio.gather(*(run_single(i) for i in missing))
+    return [results[i] for i in range(len(texts))]
+
+def _script_prompt(sections: List[Dict[str, str]]) -> str:
     joined = "\n\n".join([f"{s['title']}: {s['summary']}" for s in sections])
     dialect_instruction = """
     - narration: Use Egyptian Arabic colloquial (عامية مصرية) with simple natural phrasing
     """ if getattr(settings, "ARABIC_DIALECT", "MSA").lower() in ["egyptian", "eg", "egy"] else """
     - narration: Voice-over narration text (in Modern Standard Arabic, simple and clear)
     """
-    prompt = f"""Convert the following summaries into a short educational video script.
+    return f"""Convert the following summaries into a short educational video script.
     For each scene provide:
     - overlay: Short text to display on screen (in Arabic)
     {dialect_instruction}
@@ -165,10 +342,9 @@ def generate_video_script(sections: List[Dict[str, str]]) -> List[Dict[str, str]
     Text:
     {joined}
     """
-    response = model.generate_content(prompt)
-    content = response.text if response and getattr(response, "text", None) else "[]"
+
+def _parse_script(content: str, sections: List[Dict[str, str]]) -> List[Dict[str, str]]:
     try:
-        import json
         scenes = json.loads(content)
         normalized = []
         if isinstance(scenes, list):
@@ -181,26 +357,51 @@ def generate_video_script(sections: List[Dict[str, str]]) -> List[Dict[str, str]
     except Exception:
         return [{"overlay": s.get("title", "Scene"), "narration": s.get("summary", "")} for s in sections]
 
-def extract_keywords(text: str, k: int = 8) -> List[str]:
-    """Extract keywords from text"""
-    model = _get_model()
-    prompt = f"""Extract exactly {k} keywords from the following text. Return them as a single line separated by commas.
+def generate_video_script(sections: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Generate video script: for each section -> narration text (Arabic) and on-screen text (overlay)
+    Returns list of scenes: {"overlay": str, "narration": str} - all in Arabic
+    """
+    content = _generate_text(_script_prompt(sections), "video_script") or "[]"
+    return _parse_script(content, sections)
+
+async def generate_video_script_async(sections: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Async variant of generate_video_script"""
+    content = await _generate_text_async(_script_prompt(sections), "video_script") or "[]"
+    return _parse_script(content, sections)
+
+def _keywords_prompt(text: str, k: int) -> str:
+    return f"""Extract exactly {k} keywords from the following text. Return them as a single line separated by commas.
     
     Text:
     {text}
     """
-    response = model.generate_content(prompt)
-    raw = response.text if response and getattr(response, "text", None) else ""
+
+def _parse_keywords(raw: str, k: int) -> List[str]:
     parts = [p.strip() for p in raw.replace("\n", ",").split(",")]
     return [p for p in parts if p][:k]
 
-def translate_text(text: str, target_language: str) -> str:
-    """Translate given text to target language using Gemini."""
-    model = _get_model()
-    prompt = f"""Translate the following text to {target_language}. Preserve meaning and tone.
+def extract_keywords(text: str, k: int = 8) -> List[str]:
+    """Extract keywords from text"""
+    return _parse_keywords(_generate_text(_keywords_prompt(text, k), "keywords"), k)
+
+async def extract_keywords_async(text: str, k: int = 8) -> List[str]:
+    """Async variant of extract_keywords"""
+    return _parse_keywords(await _generate_text_async(_keywords_prompt(text, k), "keywords"), k)
+
+def _translate_prompt(text: str, target_language: str) -> str:
+    return f"""Translate the following text to {target_language}. Preserve meaning and tone.
 
 Text:
 {text}
 """
-    response = model.generate_content(prompt)
-    return response.text.strip() if response and getattr(response, "text", None) else text
+
+def translate_text(text: str, target_language: str) -> str:
+    """Translate given text to target language using Gemini."""
+    translated = _generate_text(_translate_prompt(text, target_language), "translate")
+    return translated.strip() if translated else text
+
+async def translate_text_async(text: str, target_language: str) -> str:
+    """Async variant of translate_text"""
+    translated = await _generate_text_async(_translate_prompt(text, target_language), "translate")
+    return translated.strip() if translated else text
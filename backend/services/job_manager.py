@@ -1,44 +1,324 @@
-import uuid
+import json
 import threading
-from typing import Dict, Any
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from loguru import logger
+from config import settings
+from services.local_store import get_connection
+
+# Once a job reaches one of these it never changes status again
+_TERMINAL = ("done", "error")
+
+# Enforce retention every N creations rather than on every write
+_RETENTION_EVERY = 50
+
+# Reads refresh a job's LRU position at most this often, so status polling stays read-only
+_TOUCH_INTERVAL = 60
+
+_STATS: Dict[str, int] = {"evicted_expired": 0, "evicted_entries": 0, "evicted_bytes": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _pack(result: Any) -> bytes:
+    """Results are stored as zlib-compressed JSON; Arabic summaries and scripts shrink ~3-4x."""
+    return zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+
+
+def _unpack(blob) -> Any:
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class MemoryJobStore:
+    """Jobs in a process-local LRU; only correct with a single worker process."""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _resize(job: Dict[str, Any]):
+        job["size"] = (
+            len(job["result"] or b"")
+            + len((job["error"] or "").encode("utf-8"))
+            + len(json.dumps(job["partial"], ensure_ascii=False).encode("utf-8"))
+        )
+
+    def create(self, job_id: str):
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "status": "queued", "progress": 0, "result": None, "error": None, "partial": {},
+                "created_at": now, "updated_at": now, "size": 0,
+            }
+
+    def update(self, job_id: str, fields: Dict[str, Any]) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in _TERMINAL:
+                return False
+            job.update({k: _pack(v) if k == "result" else v for k, v in fields.items()})
+            job["updated_at"] = time.time()
+            self._resize(job)
+            self._jobs.move_to_end(job_id)
+            return True
+
+    def merge_partial(self, job_id: str, partial: Dict[str, Any]):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["partial"].update(partial)
+                job["updated_at"] = time.time()
+                self._resize(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._jobs.move_to_end(job_id)
+            snapshot = {k: v for k, v in job.items() if k != "size"}
+        return {**snapshot, "result": _unpack(snapshot["result"]), "partial": dict(snapshot["partial"])}
+
+    def enforce_retention(self, older_than: float, max_entries: int, max_bytes: int) -> Dict[str, int]:
+        evicted = {"expired": 0, "entries": 0, "bytes": 0}
+        with self._lock:
+            finished = [k for k, j in self._jobs.items() if j["status"] in _TERMINAL]
+            total_bytes = sum(j["size"] for j in self._jobs.values())
+            # Least recently used first; queued and running jobs are never evicted
+            for job_id in finished:
+                job = self._jobs[job_id]
+                if job["updated_at"] < older_than:
+                    reason = "expired"
+                elif len(self._jobs) > max_entries:
+                    reason = "entries"
+                elif total_bytes > max_bytes:
+                    reason = "bytes"
+                else:
+                    continue
+                total_bytes -= job["size"]
+                del self._jobs[job_id]
+                evicted[reason] += 1
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for job in self._jobs.values():
+                by_status[job["status"]] = by_status.get(job["status"], 0) + 1
+            return {"entries": len(self._jobs), "bytes": sum(j["size"] for j in self._jobs.values()), "by_status": by_status}
+
+
+class SqliteJobStore:
+    """Jobs in a WAL-mode SQLite file, so every gunicorn worker sees the same jobs and they survive restarts."""
 
+    def __init__(self, path: str):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._initialized = False
 
-_JOBS: Dict[str, Dict[str, Any]] = {}
-_LOCK = threading.Lock()
+    def _conn(self):
+        conn = get_connection(self.path)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS jobs ("
+                        "id TEXT PRIMARY KEY, status TEXT NOT NULL, progress INTEGER NOT NULL DEFAULT 0, "
+                        "result BLOB, error TEXT, partial TEXT NOT NULL DEFAULT '{}', size INTEGER NOT NULL DEFAULT 0, "
+                        "created_at REAL NOT NULL, updated_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at)")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_accessed ON jobs (status, accessed_at)")
+                    self._initialized = True
+        return conn
+
+    def create(self, job_id: str):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, status, progress, created_at, updated_at, accessed_at) VALUES (?, 'queued', 0, ?, ?, ?)",
+            (job_id, now, now, now),
+        )
+
+    def update(self, job_id: str, fields: Dict[str, Any]) -> bool:
+        values = {k: _pack(v) if k == "result" else v for k, v in fields.items()}
+        if "partial" in values:
+            values["partial"] = json.dumps(values["partial"], ensure_ascii=False)
+        assignments = ", ".join(f"{k} = ?" for k in values)
+        # SET expressions see the old row, so size uses the new values where they change
+        size_terms, size_params = [], []
+        for column in ("result", "error", "partial"):
+            if column in values:
+                size_terms.append("COALESCE(LENGTH(CAST(? AS BLOB)), 0)")
+                size_params.append(values[column])
+            else:
+                size_terms.append(f"COALESCE(LENGTH(CAST({column} AS BLOB)), 0)")
+        # Guard in the same statement, so a late progress update cannot undo done/error
+        sql = (
+            f"UPDATE jobs SET {assignments}, updated_at = ?, accessed_at = ?, size = {' + '.join(size_terms)} "
+            "WHERE id = ? AND status NOT IN (?, ?)"
+        )
+        now = time.time()
+        params = [*values.values(), now, now, *size_params, job_id, *_TERMINAL]
+        return self._conn().execute(sql, params).rowcount > 0
+
+    def merge_partial(self, job_id: str, partial: Dict[str, Any]):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT partial FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                merged = json.dumps({**json.loads(row[0] or "{}"), **partial}, ensure_ascii=False)
+                conn.execute(
+                    "UPDATE jobs SET partial = ?, updated_at = ?, "
+                    "size = COALESCE(LENGTH(CAST(result AS BLOB)), 0) + COALESCE(LENGTH(CAST(error AS BLOB)), 0) "
+                    "+ LENGTH(CAST(? AS BLOB)) WHERE id = ?",
+                    (merged, time.time(), merged, job_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT status, progress, result, error, partial, created_at, updated_at, accessed_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status, progress, result, error, partial, created_at, updated_at, accessed_at = row
+        now = time.time()
+        if now - accessed_at > _TOUCH_INTERVAL:
+            conn.execute("UPDATE jobs SET accessed_at = ? WHERE id = ?", (now, job_id))
+        return {
+            "status": status,
+            "progress": progress,
+            "result": _unpack(result),
+            "error": error,
+            "partial": json.loads(partial or "{}"),
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def enforce_retention(self, older_than: float, max_entries: int, max_bytes: int) -> Dict[str, int]:
+        conn = self._conn()
+        evicted = {"expired": 0, "entries": 0, "bytes": 0}
+        evicted["expired"] = conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*_TERMINAL, older_than)
+        ).rowcount
+
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM jobs").fetchone()
+        if entries > max_entries:
+            evicted["entries"] = conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN (?, ?) "
+                "ORDER BY accessed_at ASC LIMIT ?)",
+                (*_TERMINAL, entries - max_entries),
+            ).rowcount
+            total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM jobs").fetchone()[0]
+
+        if total_bytes > max_bytes:
+            # Least recently used finished jobs until enough bytes are freed
+            evicted["bytes"] = conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM ("
+                "SELECT id, size, SUM(size) OVER (ORDER BY accessed_at ASC, id) AS freed "
+                "FROM jobs WHERE status IN (?, ?)) WHERE freed - size < ?)",
+                (*_TERMINAL, total_bytes - max_bytes),
+            ).rowcount
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM jobs").fetchone()
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"entries": entries, "bytes": total_bytes, "by_status": by_status}
+
+
+def _default_store():
+    if settings.JOB_STORE == "memory":
+        return MemoryJobStore()
+    return SqliteJobStore(settings.JOB_STORE_PATH)
+
+
+_store = _default_store()
+_created = 0
+_created_lock = threading.Lock()
+
+
+def set_job_store(store):
+    """Replace the job store; any object with the MemoryJobStore methods works."""
+    global _store
+    _store = store
+
+
+def enforce_job_retention() -> Dict[str, int]:
+    """
+    Evict finished jobs older than JOB_TTL, then least recently used finished jobs while
+    there are more than JOB_MAX_ENTRIES or they take more than JOB_MAX_BYTES.
+    Queued and running jobs are never evicted.
+    """
+    try:
+        evicted = _store.enforce_retention(time.time() - settings.JOB_TTL, settings.JOB_MAX_ENTRIES, settings.JOB_MAX_BYTES)
+    except Exception as e:
+        logger.warning(f"Could not enforce job retention: {e}")
+        return {}
+    with _STATS_LOCK:
+        for reason, count in evicted.items():
+            _STATS[f"evicted_{reason}"] += count
+    if any(evicted.values()):
+        logger.info(f"Evicted finished jobs: {evicted}")
+    return evicted
+
+
+def get_store_stats() -> Dict[str, Any]:
+    """Job count and stored bytes by status, plus eviction counters for this process."""
+    with _STATS_LOCK:
+        counters = dict(_STATS)
+    return {
+        **_store.stats(),
+        **counters,
+        "limits": {"max_entries": settings.JOB_MAX_ENTRIES, "max_bytes": settings.JOB_MAX_BYTES, "ttl": settings.JOB_TTL},
+    }
 
 
 def create_job() -> str:
+    global _created
     job_id = uuid.uuid4().hex
-    with _LOCK:
-        _JOBS[job_id] = {"status": "queued", "progress": 0, "result": None, "error": None}
+    _store.create(job_id)
+    with _created_lock:
+        _created += 1
+        retention_due = _created % _RETENTION_EVERY == 0
+    if retention_due:
+        enforce_job_retention()
     return job_id
 
 
 def set_status(job_id: str, status: str, progress: int = None):
-    with _LOCK:
-        if job_id in _JOBS:
-            _JOBS[job_id]["status"] = status
-            if progress is not None:
-                _JOBS[job_id]["progress"] = progress
+    fields: Dict[str, Any] = {"status": status}
+    if progress is not None:
+        fields["progress"] = progress
+    _store.update(job_id, fields)
+
+
+def set_partial_result(job_id: str, partial: Dict[str, Any]):
+    """Merge fields that are available before the job finishes (e.g. a live playlist URL)."""
+    _store.merge_partial(job_id, partial)
 
 
 def set_result(job_id: str, result: Dict[str, Any]):
-    with _LOCK:
-        if job_id in _JOBS:
-            _JOBS[job_id]["result"] = result
-            _JOBS[job_id]["status"] = "done"
-            _JOBS[job_id]["progress"] = 100
+    # The final result supersedes the partial stage outputs, so drop them rather than store both
+    _store.update(job_id, {"result": result, "partial": {}, "status": "done", "progress": 100})
 
 
 def set_error(job_id: str, error_message: str):
-    with _LOCK:
-        if job_id in _JOBS:
-            _JOBS[job_id]["error"] = error_message
-            _JOBS[job_id]["status"] = "error"
+    _store.update(job_id, {"error": error_message, "status": "error"})
 
 
 def get_job(job_id: str) -> Dict[str, Any]:
-    with _LOCK:
-        return _JOBS.get(job_id, {"status": "not_found"})
-
-
+    job = _store.get(job_id)
+    return job if job is not None else {"status": "not_found"}
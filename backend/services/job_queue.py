@@ -0,0 +1,156 @@
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from config import settings
+from services.local_store import get_connection
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+class QueueFull(Exception):
+    """Raised by enqueue() when JOB_QUEUE_MAX jobs are already waiting or running."""
+
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Job queue is full ({depth} jobs)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+def _conn():
+    """The queue lives next to the jobs table so enqueueing and status share one file."""
+    global _initialized
+    conn = get_connection(settings.JOB_STORE_PATH)
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS job_queue ("
+                    "job_id TEXT PRIMARY KEY, priority INTEGER NOT NULL DEFAULT 0, payload TEXT NOT NULL, "
+                    "enqueued_at REAL NOT NULL, claimed_by TEXT, claimed_at REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_job_queue_ready ON job_queue (claimed_by, priority, enqueued_at)")
+                _initialized = True
+    return conn
+
+
+def runner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def depth() -> Tuple[int, int]:
+    """(waiting, running) jobs in the queue."""
+    waiting, running = _conn().execute(
+        "SELECT COUNT(*) - COUNT(claimed_by), COUNT(claimed_by) FROM job_queue"
+    ).fetchone()
+    return waiting or 0, running or 0
+
+
+def retry_after_seconds(waiting: int) -> int:
+    """Rough wait before a new job could be admitted: queued batches ahead times the per-job estimate."""
+    batches = waiting // max(1, settings.JOB_RUNNER_CONCURRENCY) + 1
+    return batches * settings.JOB_RETRY_AFTER
+
+
+def enqueue(job_id: str, payload: Dict[str, Any], priority: int = 0):
+    """Admit a job or raise QueueFull; the depth check and insert happen in one write transaction."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM job_queue").fetchone()[0]
+        if total >= settings.JOB_QUEUE_MAX:
+            conn.execute("ROLLBACK")
+            raise QueueFull(total, retry_after_seconds(total))
+        conn.execute(
+            "INSERT INTO job_queue (job_id, priority, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+            (job_id, priority, json.dumps(payload), time.time()),
+        )
+        conn.execute("COMMIT")
+    except QueueFull:
+        raise
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def claim(runner: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Atomically take the highest-priority, oldest waiting job; None when the queue is empty.
+    A claim whose lease ran out (its runner died or hung) counts as waiting.
+    """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = conn.execute(
+            "SELECT job_id, payload FROM job_queue WHERE claimed_by IS NULL OR claimed_at < ? "
+            "ORDER BY priority DESC, enqueued_at ASC LIMIT 1",
+            (now - settings.JOB_CLAIM_LEASE,),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE job_queue SET claimed_by = ?, claimed_at = ? WHERE job_id = ?",
+                (runner, now, row[0]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return (row[0], json.loads(row[1])) if row is not None else None
+
+
+def renew(runner: str) -> int:
+    """Extend the lease on every job a live runner holds."""
+    return _conn().execute(
+        "UPDATE job_queue SET claimed_at = ? WHERE claimed_by = ?", (time.time(), runner)
+    ).rowcount
+
+
+def complete(job_id: str, runner: str):
+    """Drop a finished job, unless its lease expired and another runner has taken it over."""
+    _conn().execute(
+        "DELETE FROM job_queue WHERE job_id = ? AND (claimed_by = ? OR claimed_by IS NULL)", (job_id, runner)
+    )
+
+
+def release(runner: str) -> int:
+    """Put a runner's claimed jobs back in line (used when it stops before finishing them)."""
+    return _conn().execute(
+        "UPDATE job_queue SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ?", (runner,)
+    ).rowcount
+
+
+def release_orphans() -> int:
+    """
+    Requeue jobs whose claim lease expired, on any host, and those claimed by runners
+    on this host whose process no longer exists.
+    """
+    host = socket.gethostname()
+    released = _conn().execute(
+        "UPDATE job_queue SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by IS NOT NULL AND claimed_at < ?",
+        (time.time() - settings.JOB_CLAIM_LEASE,),
+    ).rowcount
+    for (claimed_by,) in _conn().execute(
+        "SELECT DISTINCT claimed_by FROM job_queue WHERE claimed_by IS NOT NULL"
+    ).fetchall():
+        claimed_host, _, pid = claimed_by.rpartition(":")
+        if claimed_host != host or not pid.isdigit() or _pid_alive(int(pid)):
+            continue
+        released += release(claimed_by)
+    if released:
+        logger.warning(f"Requeued {released} job(s) left behind by stopped or unresponsive runners")
+    return released
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from loguru import logger
+from config import settings
+from services.local_store import get_connection
+
+# Trim the disk tier every N writes rather than on every put
+_TRIM_EVERY = 100
+# LRU order only needs to be approximate; refresh accessed_at at most this often (seconds)
+_TOUCH_INTERVAL = 60
+
+_STATS: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _bump(counter: str):
+    with _STATS_LOCK:
+        _STATS[counter] += 1
+
+
+class MemoryLRU:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, max_entries)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteResponseStore:
+    """Disk tier shared by all workers through a WAL-mode SQLite file."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self):
+        conn = get_connection(self.path)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS llm_responses ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                        "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses (accessed_at)")
+                    self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at, accessed_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            return None
+        if now - accessed_at > _TOUCH_INTERVAL:
+            conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str, ttl: int):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        self._writes += 1
+        if self._writes % _TRIM_EVERY == 0:
+            self.trim()
+
+    def trim(self):
+        """Drop expired rows, then least recently used rows beyond max_entries."""
+        conn = self._conn()
+        conn.execute("DELETE FROM llm_responses WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM llm_responses WHERE key IN ("
+            "SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM llm_responses")
+
+
+_memory = MemoryLRU(settings.LLM_CACHE_MEMORY_ENTRIES)
+_backend = SqliteResponseStore(settings.CACHE_DB_PATH, settings.LLM_CACHE_MAX_ENTRIES)
+
+
+def set_llm_cache_backend(backend):
+    """
+    Replace the disk tier. Any object with get(key) and set(key, value, ttl) works;
+    pass None to keep only the in-process LRU.
+    """
+    global _backend
+    _backend = backend
+
+
+def make_key(model_name: str, namespace: str, prompt: str) -> str:
+    """Cache key over model, calling function and whitespace-normalized prompt."""
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model_name}\x00{namespace}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[str]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    value = _memory.get(key)
+    if value is not None:
+        _bump("memory_hits")
+        return value
+    if _backend is not None:
+        try:
+            value = _backend.get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            value = None
+        if value is not None:
+            _memory.set(key, value, settings.LLM_CACHE_TTL)
+            _bump("disk_hits")
+            return value
+    _bump("misses")
+    return None
+
+
+def put(key: str, value: str):
+    if not settings.LLM_CACHE_ENABLED:
+        return
+    _memory.set(key, value, settings.LLM_CACHE_TTL)
+    if _backend is not None:
+        try:
+            _backend.set(key, value, settings.LLM_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+    _bump("puts")
+
+
+def clear():
+    _memory.clear()
+    if _backend is not None:
+        _backend.clear()
+
+
+def get_stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
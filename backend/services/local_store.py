@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import threading
+
+_LOCAL = threading.local()
+
+
+def get_connection(path: str) -> sqlite3.Connection:
+    """
+    Return a per-thread, per-process SQLite connection in WAL mode.
+    WAL lets every gunicorn worker read while one writes, so the file can be shared.
+    """
+    conns = getattr(_LOCAL, "conns", None)
+    if conns is None:
+        conns = _LOCAL.conns = {}
+    key = (os.getpid(), path)
+    conn = conns.get(key)
+    if conn is None:
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        # isolation_level=None: autocommit unless a transaction is opened explicitly
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[key] = conn
+    return conn
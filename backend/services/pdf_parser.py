@@ -1,21 +1,282 @@
-from pdfminer.high_level import extract_text
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+from loguru import logger
+import importlib.util
 import logging
+import multiprocessing
 import os
+import queue
+import threading
+import time
 from config import settings
 
 # Reduce noisy warnings from pdfminer (e.g., FontBBox parsing)
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
-def extract_text_from_pdf(file_path: str) -> str:
+# pdfminer ends every page with a form feed; the other backends follow the same convention
+_PAGE_BREAK = "\x0c"
+_END_OF_PAGES = object()
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+# Each process that extracts gets its own pool, so the default stays small whatever the core count
+_DEFAULT_PDF_WORKERS = 4
+
+
+class PdfBackendTimeout(Exception):
+    """A backend spent more than PDF_BACKEND_TIMEOUT seconds extracting one document."""
+
+
+def _pdf_workers() -> int:
+    return settings.PDF_EXTRACT_WORKERS or min(_DEFAULT_PDF_WORKERS, os.cpu_count() or 1)
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Shared pool of extraction processes; spawn avoids forking a threaded web worker."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=_pdf_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+def _count_pages(file_path: str, limit: int) -> int:
+    """Number of pages up to limit; walking the page tree is cheap next to layout analysis."""
+    with open(file_path, "rb") as f:
+        return sum(1 for _ in islice(PDFPage.get_pages(f), limit))
+
+
+def _pdfminer_pages_inprocess(file_path: str, start: int, stop: int) -> Iterator[str]:
+    """Yield the text of each page as soon as it is laid out (same text as pdfminer's extract_text)."""
+    with open(file_path, "rb") as fp, StringIO() as output:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = TextConverter(rsrcmgr, output, codec="utf-8", laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page in PDFPage.get_pages(fp, pagenos=set(range(start, stop)), maxpages=stop, caching=True):
+            interpreter.process_page(page)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+
+
+def _pdfminer_shard(file_path: str, start: int, stop: int) -> List[str]:
+    return list(_pdfminer_pages_inprocess(file_path, start, stop))
+
+
+def _pdfminer_pages_parallel(file_path: str, start: int, stop: int) -> Iterator[str]:
     """
-    Extract text from PDF file
+    Yield pages in order while consecutive shards are laid out on the process pool.
+    Only a pool's worth of shards is in flight, so stopping early leaves later pages unparsed.
+    """
+    per_shard = max(1, settings.PDF_MIN_PAGES_PER_SHARD)
+    bounds = [(i, min(i + per_shard, stop)) for i in range(start, stop, per_shard)]
+    pool = _get_pdf_pool()
+    logger.debug(f"Extracting pages {start}-{stop} in {len(bounds)} shards")
+    pending = deque(pool.submit(_pdfminer_shard, file_path, *b) for b in bounds[:_pdf_workers()])
+    next_shard = len(pending)
+    try:
+        while pending:
+            pages = pending.popleft().result(timeout=settings.PDF_BACKEND_TIMEOUT)
+            if next_shard < len(bounds):
+                pending.append(pool.submit(_pdfminer_shard, file_path, *bounds[next_shard]))
+                next_shard += 1
+            yield from pages
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def _pdfminer_pages(file_path: str, start: int, stop: int) -> Iterator[str]:
+    """Pure-Python layout analysis: slow, so longer documents are sharded across processes."""
+    try:
+        stop = _count_pages(file_path, stop)
+        shardable = _pdf_workers() > 1 and stop - start >= 2 * settings.PDF_MIN_PAGES_PER_SHARD
+    except Exception as e:
+        logger.warning(f"Could not read PDF page tree, extracting sequentially: {e}")
+        shardable = False
+    if shardable:
+        produced = 0
+        try:
+            for text in _pdfminer_pages_parallel(file_path, start, stop):
+                produced += 1
+                yield text
+            return
+        except Exception as e:
+            logger.warning(f"Parallel PDF extraction failed, continuing in-process: {e}")
+            shutdown_pdf_pool()
+            start += produced
+    yield from _pdfminer_pages_inprocess(file_path, start, stop)
+
+
+def _pymupdf_pages(file_path: str, start: int, stop: int) -> Iterator[str]:
+    try:
+        import pymupdf
+    except ImportError:  # releases before 1.24 only ship the "fitz" name
+        import fitz as pymupdf
+
+    with pymupdf.open(file_path) as doc:
+        for index in range(start, min(stop, doc.page_count)):
+            yield doc.load_page(index).get_text("text") + _PAGE_BREAK
+
+
+def _pypdfium2_pages(file_path: str, start: int, stop: int) -> Iterator[str]:
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(file_path)
+    try:
+        for index in range(start, min(stop, len(doc))):
+            page = doc[index]
+            textpage = page.get_textpage()
+            try:
+                yield textpage.get_text_range().replace("\r\n", "\n") + _PAGE_BREAK
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        doc.close()
+
+
+# name -> (modules, any of which provides it; page iterator over [start, stop)); "auto" tries them in this order
+_BACKENDS: Dict[str, tuple] = {
+    "pypdfium2": (("pypdfium2",), _pypdfium2_pages),
+    "pymupdf": (("pymupdf", "fitz"), _pymupdf_pages),
+    "pdfminer": (("pdfminer",), _pdfminer_pages),
+}
+
+
+def available_backends() -> List[str]:
+    return [
+        name for name, (modules, _) in _BACKENDS.items()
+        if any(importlib.util.find_spec(module) is not None for module in modules)
+    ]
+
+
+def _backend_chain() -> List[str]:
+    """Backends to try in order; pdfminer (a hard dependency) is always the last resort."""
+    if settings.PDF_BACKEND == "auto":
+        return available_backends()
+    if settings.PDF_BACKEND not in _BACKENDS:
+        logger.warning(f"Unknown PDF_BACKEND '{settings.PDF_BACKEND}', using pdfminer")
+        return ["pdfminer"]
+    return [settings.PDF_BACKEND] + (["pdfminer"] if settings.PDF_BACKEND != "pdfminer" else [])
+
+
+def _timed_pages(name: str, pages_func: Callable, file_path: str, start: int, stop: int) -> Iterator[str]:
+    """
+    Run the backend on a daemon thread that hands pages over a one-slot queue, so the timeout
+    also fires while a page is still being parsed. Only time spent waiting for the backend counts,
+    not time the consumer is paused. A backend stuck inside native code keeps its thread until
+    it returns, but the caller moves on to the next backend.
+    """
+    handoff: "queue.Queue" = queue.Queue(maxsize=1)
+    abandoned = threading.Event()
+
+    def hand_over(item) -> bool:
+        while not abandoned.is_set():
+            try:
+                handoff.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        pages = pages_func(file_path, start, stop)
+        try:
+            for text in pages:
+                if not hand_over(text):
+                    return
+            hand_over(_END_OF_PAGES)
+        except Exception as e:
+            hand_over(e)
+        finally:
+            pages.close()
+
+    threading.Thread(target=produce, name=f"pdf-{name}", daemon=True).start()
+    spent = 0.0
+    try:
+        while True:
+            remaining = settings.PDF_BACKEND_TIMEOUT - spent
+            started = time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                item = handoff.get(timeout=remaining)
+            except queue.Empty:
+                raise PdfBackendTimeout(f"{name} exceeded {settings.PDF_BACKEND_TIMEOUT}s")
+            finally:
+                spent += time.monotonic() - started
+            if item is _END_OF_PAGES:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        abandoned.set()
+
+
+def iter_pdf_text(file_path: str) -> Iterator[str]:
+    """
+    Yield the text of the first MAX_PDF_PAGES pages in order, one page at a time.
+    If a backend fails or times out, the next one continues from the first page not yet
+    produced, within the same page limit. Callers stop iterating once they have enough
+    text; later pages are then never parsed.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError("File not found.")
+    max_pages = max(1, settings.MAX_PDF_PAGES)
+    produced = 0
+    error: Optional[Exception] = None
+    for name in _backend_chain():
+        try:
+            for text in _timed_pages(name, _BACKENDS[name][1], file_path, produced, max_pages):
+                produced += 1
+                yield text
+            return
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            error = e
+            logger.warning(f"PDF backend '{name}' failed after {produced} page(s): {e}")
+    raise error or RuntimeError("No PDF backend available")
+
+
+def read_text(pages: Iterator[str], max_chars: int) -> str:
+    """Consume pages until max_chars characters are collected; the iterator can be resumed later."""
+    parts, total = [], 0
+    while total < max_chars:
+        page = next(pages, None)
+        if page is None:
+            break
+        parts.append(page)
+        total += len(page)
+    return "".join(parts)
+
+
+def extract_text_from_pdf(file_path: str, max_chars: Optional[int] = None) -> str:
+    """
+    Extract text from PDF file, stopping after about max_chars characters if given
+    """
+    pages = iter_pdf_text(file_path)
     try:
-        # Only parse the first N pages to avoid timeouts on huge PDFs
-        page_numbers = list(range(max(1, settings.MAX_PDF_PAGES)))
-        return extract_text(file_path, page_numbers=page_numbers)
-    except Exception:
-        # Fallback to default extraction if page_numbers unsupported in env
-        return extract_text(file_path)
+        return read_text(pages, max_chars) if max_chars else "".join(pages)
+    finally:
+        pages.close()
@@ -0,0 +1,223 @@
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+from config import settings
+from services.pdf_parser import iter_pdf_text, read_text
+from services.sections import detect_sections, end_matter_start, section_digest
+from services.gemini_service import summarize_with_gemini, segment_paper, generate_video_script, classify_field_with_gemini, extract_keywords
+from services.video_maker import make_video_from_scenes, hls_dirname
+from services.job_manager import set_status, set_result, set_error, set_partial_result
+from services.result_cache import store_result
+from services.executor import submit, abandon
+
+# Steps whose output is exposed to clients before the whole job finishes
+_PARTIAL_STEPS = ("sections", "script", "summary", "field", "keywords")
+
+# Character budgets of the prompts fed from the paper text: classification, keywords and the
+# summary read the head; segmentation gets per-section excerpts of the whole body
+_HEAD_CHARS = 3000
+_SECTIONS_CHARS = 8000
+
+_FALLBACK_SECTIONS = [{"title": "الملخص", "summary": "تم تلخيص الورقة لاحقاً بسبب قيود الوقت."}]
+
+
+def run_dag(steps: Dict[str, Dict[str, Any]], on_step_done: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Run a dependency graph of steps, starting each one as soon as its deps have finished.
+
+    Each step is {"func": callable(results) -> value, "deps": [names], "pool": executor pool,
+    "timeout": seconds, "default": value, "required": bool}. Steps run on the shared executor
+    pools; the timeout counts from when a worker picks the step up. A failed, timed-out or
+    never-scheduled step yields its default so dependents still run, unless it is required,
+    in which case the whole run fails.
+    """
+    results: Dict[str, Any] = {}
+    pending = dict(steps)
+    running: Dict[Any, tuple] = {}
+    try:
+        while pending or running:
+            ready = [name for name, step in pending.items() if all(d in results for d in step.get("deps", ()))]
+            for name in ready:
+                step = pending.pop(name)
+                fut = submit(step.get("pool", "default"), step["func"], dict(results))
+                running[fut] = (name, time.monotonic())
+            if not running:
+                raise ValueError(f"Unresolvable step dependencies: {sorted(pending)}")
+
+            deadlines = {fut: _step_deadline(fut, steps[name], submitted_at) for fut, (name, submitted_at) in running.items()}
+            wait_for = max(0.0, min(deadlines.values()) - time.monotonic())
+            # Queued steps get a real deadline once they start, so re-check at least every second
+            done, _ = wait(list(running), timeout=min(wait_for, 1.0), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for fut in list(running):
+                name, _ = running[fut]
+                step = steps[name]
+                if fut in done:
+                    try:
+                        value = fut.result()
+                    except Exception as e:
+                        if step.get("required"):
+                            raise
+                        logger.warning(f"Step '{name}' failed: {e}")
+                        value = step.get("default")
+                elif now >= deadlines[fut]:
+                    started = fut.task_state["started_at"] is not None
+                    abandon(fut)
+                    reason = f"timed out after {step.get('timeout', 60)}s" if started else "never got a free worker"
+                    if step.get("required"):
+                        raise TimeoutError(f"Step '{name}' {reason}")
+                    logger.warning(f"Step '{name}' {reason}")
+                    value = step.get("default")
+                else:
+                    continue
+                del running[fut]
+                results[name] = value
+                if on_step_done:
+                    on_step_done(name, results)
+    finally:
+        # Never block on abandoned work; queued steps of a failed run are cancelled
+        for fut in running:
+            abandon(fut)
+    return results
+
+
+def _step_deadline(fut, step: Dict[str, Any], submitted_at: float) -> float:
+    started_at = fut.task_state["started_at"]
+    if started_at is None:
+        return submitted_at + settings.EXECUTOR_QUEUE_TIMEOUT
+    return started_at + step.get("timeout", 60)
+
+
+def _script_or_fallback(results: Dict[str, Any]) -> List[Dict[str, str]]:
+    script = results.get("script")
+    if script:
+        return script
+    return [{"overlay": s.get("title", "مشهد"), "narration": s.get("summary", "")} for s in results["sections"]]
+
+
+def _remove_partial_video(path: str):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        logger.warning(f"Could not remove partial video {path}: {e}")
+
+
+def process_paper_job(job_id: str, save_path: str, cache_key: Optional[str] = None):
+    """Run the full upload pipeline for one job and record its result or error."""
+    video_filename = f"video_{uuid.uuid4().hex}.mp4"
+    out_path = os.path.join(settings.OUTPUT_DIR, video_filename)
+    stream_name = hls_dirname(video_filename) if settings.VIDEO_HLS_ENABLED else None
+    playlist_url = f"/papers/video/{stream_name}/index.m3u8" if stream_name else None
+
+    def extract_head(_):
+        # Steps that only need the first pages start while the rest is still being extracted
+        pages = iter_pdf_text(save_path)
+        head = read_text(pages, _HEAD_CHARS)
+        if not head or len(head.strip()) < 100:
+            pages.close()
+            raise Exception("Could not extract sufficient text from PDF")
+        return {"text": head, "pages": pages}
+
+    def extract(r):
+        head = r["head"]
+        budget = settings.MAX_TEXT_LENGTH
+        parts, total = [head["text"]], len(head["text"])
+        try:
+            # References and appendices are dropped anyway, so stop reading once they begin
+            while total < budget and end_matter_start(parts[-1]) is None:
+                page = next(head["pages"], None)
+                if page is None:
+                    break
+                parts.append(page)
+                total += len(page)
+        finally:
+            head["pages"].close()
+        return "".join(parts)[:budget]
+
+    def sections(r):
+        outline = detect_sections(r["text"])
+        if outline:
+            digest = section_digest(outline, _SECTIONS_CHARS)
+            segmented = segment_paper(digest, outlined=True)
+        else:
+            segmented = segment_paper(r["text"][:_SECTIONS_CHARS])
+        return (segmented or _FALLBACK_SECTIONS)[:settings.MAX_SECTIONS]
+
+    silent_scenes = []
+
+    def video(r):
+        os.makedirs(settings.OUTPUT_DIR, exist_ok=True)
+        if not stream_name:
+            return make_video_from_scenes(_script_or_fallback(r), output_path=out_path, on_missing_audio=silent_scenes.extend)
+        # Clients can start playing the playlist while later scenes are still rendering;
+        # it is announced once its first segment exists
+        return make_video_from_scenes(
+            _script_or_fallback(r),
+            output_path=out_path,
+            hls_dir=os.path.join(settings.OUTPUT_DIR, stream_name),
+            on_playable=lambda: set_partial_result(job_id, {"playlist_url": playlist_url}),
+            on_missing_audio=silent_scenes.extend,
+        )
+
+    # name -> step spec; "weight" is the share of overall progress the step accounts for
+    steps = {
+        "head": {"func": extract_head, "deps": [], "pool": "pdf", "timeout": 90, "required": True, "weight": 10},
+        "text": {"func": extract, "deps": ["head"], "pool": "pdf", "timeout": 90, "required": True, "weight": 5},
+        "sections": {"func": sections, "deps": ["text"], "pool": "llm", "timeout": 90, "default": _FALLBACK_SECTIONS, "weight": 15},
+        "script": {"func": lambda r: generate_video_script(r["sections"]), "deps": ["sections"], "pool": "llm", "timeout": 90, "default": [], "weight": 10},
+        "field": {"func": lambda r: classify_field_with_gemini(r["head"]["text"][:_HEAD_CHARS]), "deps": ["head"], "pool": "llm", "timeout": 30, "default": "Unknown", "weight": 5},
+        "keywords": {"func": lambda r: extract_keywords(r["head"]["text"][:_HEAD_CHARS]), "deps": ["head"], "pool": "llm", "timeout": 20, "default": [], "weight": 5},
+        "summary": {"func": lambda r: summarize_with_gemini(r["head"]["text"][:_HEAD_CHARS]), "deps": ["head"], "pool": "llm", "timeout": 90, "default": "", "weight": 10},
+        "video": {"func": video, "deps": ["script"], "pool": "render", "timeout": settings.VIDEO_TIMEOUT, "default": None, "weight": 35},
+    }
+
+    def on_step_done(name: str, results: Dict[str, Any]):
+        # Publish each stage's output as soon as it exists (status polls and /papers/events see it)
+        if name == "video":
+            if results["video"]:
+                set_partial_result(job_id, {"video_url": f"/papers/video/{video_filename}"})
+        elif name in _PARTIAL_STEPS:
+            set_partial_result(job_id, {name: results[name]})
+        progress = 5 + sum(steps[n]["weight"] for n in results)
+        set_status(job_id, "processing", progress=min(progress, 95))
+        logger.debug(f"Job {job_id}: step '{name}' finished ({len(results)}/{len(steps)})")
+
+    try:
+        set_status(job_id, "processing", progress=5)
+        results = run_dag(steps, on_step_done=on_step_done)
+
+        result = {
+            "summary": results["summary"],
+            "field": results["field"],
+            "keywords": results["keywords"],
+            "sections": results["sections"],
+            "script": _script_or_fallback(results),
+        }
+        if playlist_url and os.path.exists(os.path.join(settings.OUTPUT_DIR, stream_name, "index.m3u8")):
+            result["playlist_url"] = playlist_url
+        if results["video"]:
+            result["video_filename"] = video_filename
+            result["video_url"] = f"/papers/video/{video_filename}"
+        else:
+            # A render that finished just past its timeout has no result pointing at it
+            _remove_partial_video(out_path)
+        set_result(job_id, result)
+        if silent_scenes:
+            # Narration can succeed on a retry, so a video with silent scenes is not reused
+            logger.warning(f"Job {job_id}: scenes {silent_scenes} have no narration; not caching the result")
+        elif cache_key and results["video"] and result["summary"]:
+            store_result(cache_key, result)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        set_error(job_id, str(e))
+    finally:
+        # Cleanup uploaded file
+        try:
+            if save_path and os.path.exists(save_path):
+                os.remove(save_path)
+        except Exception as ce:
+            logger.warning(f"Could not remove temp file: {ce}")
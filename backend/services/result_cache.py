@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from config import settings
+
+# Settings that change the generated summary/script/video for the same PDF
+_KEY_SETTINGS = (
+    "ARABIC_DIALECT",
+    "GEMINI_MODEL",
+    "TTS_PROVIDER",
+    "AZURE_SPEECH_VOICE",
+    "ELEVENLABS_VOICE_ID",
+    "MAX_PDF_PAGES",
+    "MAX_TEXT_LENGTH",
+    "MAX_SECTIONS",
+)
+
+# Artifacts touched more recently than this are never evicted (in-flight renders)
+_EVICTION_GRACE_SECONDS = 600
+
+_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_LOCK = threading.Lock()
+
+
+def _cache_dir() -> str:
+    return os.path.join(settings.OUTPUT_DIR, "cache")
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(_cache_dir(), f"{key}.json")
+
+
+def _bump(counter: str, n: int = 1):
+    with _LOCK:
+        _STATS[counter] += n
+
+
+def compute_cache_key(pdf_sha256: str) -> str:
+    """Combine the PDF content hash with the settings that affect the output."""
+    h = hashlib.sha256(pdf_sha256.encode("utf-8"))
+    for name in _KEY_SETTINGS:
+        h.update(f"|{name}={getattr(settings, name, '')}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_cached_result(key: str) -> Optional[Dict[str, Any]]:
+    """Return the stored job result for key, or None if missing/expired."""
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    path = _entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        _bump("misses")
+        return None
+    except Exception as e:
+        logger.warning(f"Corrupt result cache entry {key}: {e}")
+        _remove_entry(key)
+        _bump("misses")
+        return None
+
+    result = entry.get("result") or {}
+    expired = time.time() - entry.get("created_at", 0) > settings.RESULT_CACHE_MAX_AGE
+    video_filename = result.get("video_filename")
+    video_missing = bool(video_filename) and not os.path.exists(os.path.join(settings.OUTPUT_DIR, video_filename))
+    if expired or video_missing:
+        _remove_entry(key)
+        _bump("misses")
+        return None
+
+    # Mark as recently used for LRU eviction
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    _bump("hits")
+    logger.info(f"Result cache hit: {key[:12]}")
+    return result
+
+
+def store_result(key: str, result: Dict[str, Any]):
+    """Persist a finished job result and evict old artifacts if over budget."""
+    if not settings.RESULT_CACHE_ENABLED:
+        return
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        path = _entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "result": result}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        _bump("stores")
+    except Exception as e:
+        logger.warning(f"Could not store result cache entry: {e}")
+        return
+    evict_outputs()
+
+
+def _remove_entry(key: str):
+    try:
+        os.remove(_entry_path(key))
+    except OSError:
+        pass
+
+
+def _collect_units() -> List[Tuple[float, int, List[str]]]:
+    """Group OUTPUT_DIR artifacts into eviction units of (last_used, size, paths)."""
+    units = []
+    owned = set()
+    cache_dir = _cache_dir()
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if not name.endswith(".json"):
+                continue
+            entry_path = os.path.join(cache_dir, name)
+            paths = [entry_path]
+            try:
+                with open(entry_path, "r", encoding="utf-8") as f:
+                    video_filename = (json.load(f).get("result") or {}).get("video_filename")
+                if video_filename:
+                    video_path = os.path.join(settings.OUTPUT_DIR, video_filename)
+                    # The HLS rendition (if any) lives and dies with its MP4
+                    hls_path = os.path.join(settings.OUTPUT_DIR, f"hls_{os.path.splitext(video_filename)[0]}")
+                    for p in (video_path, hls_path):
+                        owned.add(os.path.abspath(p))
+                        if os.path.exists(p):
+                            paths.append(p)
+                last_used = os.path.getmtime(entry_path)
+            except Exception:
+                last_used = 0.0
+            units.append((last_used, sum(_size(p) for p in paths), paths))
+
+    if os.path.isdir(settings.OUTPUT_DIR):
+        for name in os.listdir(settings.OUTPUT_DIR):
+            path = os.path.join(settings.OUTPUT_DIR, name)
+            if os.path.abspath(path) in owned:
+                continue
+            if not os.path.isfile(path) and not (name.startswith("hls_") and os.path.isdir(path)):
+                continue
+            try:
+                units.append((os.path.getmtime(path), _size(path), [path]))
+            except OSError:
+                continue
+    return units
+
+
+def _size(path: str) -> int:
+    try:
+        if os.path.isdir(path):
+            return sum(_size(os.path.join(path, n)) for n in os.listdir(path))
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def evict_outputs() -> int:
+    """Evict OUTPUT_DIR artifacts older than RESULT_CACHE_MAX_AGE, then LRU until under OUTPUT_MAX_BYTES."""
+    now = time.time()
+    try:
+        units = sorted(_collect_units(), key=lambda u: u[0])
+    except Exception as e:
+        logger.warning(f"Could not scan output directory for eviction: {e}")
+        return 0
+
+    total = sum(u[1] for u in units)
+    evicted = 0
+    for last_used, size, paths in units:
+        age = now - last_used
+        if age < _EVICTION_GRACE_SECONDS:
+            break
+        if age <= settings.RESULT_CACHE_MAX_AGE and total <= settings.OUTPUT_MAX_BYTES:
+            continue
+        for p in paths:
+            try:
+                if os.path.isdir(p):
+                    shutil.rmtree(p)
+                else:
+                    os.remove(p)
+            except OSError:
+                pass
+        total -= size
+        evicted += 1
+    if evicted:
+        _bump("evictions", evicted)
+        logger.info(f"Evicted {evicted} output artifact(s); {total} bytes remain")
+    return evicted
+
+
+def get_stats() -> Dict[str, Any]:
+    """Hit/miss counters for this worker plus current on-disk footprint."""
+    with _LOCK:
+        stats = dict(_STATS)
+    try:
+        units = _collect_units()
+    except Exception:
+        units = []
+    stats["entries"] = sum(1 for u in units if u[2][0].endswith(".json"))
+    stats["output_bytes"] = sum(u[1] for u in units)
+    stats["enabled"] = settings.RESULT_CACHE_ENABLED
+    return stats
@@ -0,0 +1,197 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+from loguru import logger
+
+# A numbered section must hold at least this much text before the next one starts; affiliation
+# and footnote markers ("1 University of ...") sit a line or two apart and fail the check
+_MIN_SECTION_CHARS = 200
+_MAX_HEADING_CHARS = 80
+_MAX_HEADING_WORDS = 12
+# Scripts without case or word spacing (CJK) pack a heading into fewer characters
+_MAX_CASELESS_HEADING_CHARS = 32
+# Running headers and footers repeat on most pages and are never headings
+_REPEATED_LINE_COUNT = 3
+
+_NUMBERED_RE = re.compile(r"^(?:(\d{1,2})((?:\.\d{1,2}){0,3})\.?|([IVX]{1,6})\.)(?:\s+(.+))?$")
+_ABSTRACT_RE = re.compile(r"^abstract(?:\s*[.:—–-]\s*(.*))?$", re.I)
+# Only a bare heading: the keyword, optionally numbered or lettered ("7 References", "Appendix A",
+# "A. Appendix"); prose lines that merely start with the word ("Appendix B shows ...") do not match
+_END_MATTER_RE = re.compile(
+    r"^(?:(?:\d{1,2}|[A-Z]|[IVX]{1,6})\.?\s+)?"
+    r"(?P<name>(?i:references|bibliography|acknowledge?ments?|appendix|appendices|supplementary materials?))"
+    r"(?:\s+(?:[A-Z]|\d{1,2}))?[.:]?$"
+)
+_NAMED_RE = re.compile(
+    r"^(?:introduction|background|related work|preliminaries|methods?|methodology|approach|"
+    r"experiments?|experimental (?:setup|results)|evaluation|results(?: and discussion)?|"
+    r"discussion|analysis|limitations|conclusions?(?: and future work)?|future work)$",
+    re.I,
+)
+_TERMINAL_PUNCTUATION = tuple(".,;:!?。，．、")
+_ROMAN = {"I": 1, "V": 5, "X": 10}
+
+
+def _roman_to_int(numeral: str) -> int:
+    total = 0
+    for current, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN[current]
+        total += -value if _ROMAN.get(following, 0) > value else value
+    return total
+
+
+def _is_title(text: str) -> bool:
+    """Heading-shaped: short, starts with a capital (or a caseless script), and is not a sentence."""
+    if not text or len(text) > _MAX_HEADING_CHARS or len(text.split()) > _MAX_HEADING_WORDS:
+        return False
+    if not text[0].isalpha() or text[0].islower() or text.endswith(_TERMINAL_PUNCTUATION):
+        return False
+    if not text[0].isupper() and len(text) > _MAX_CASELESS_HEADING_CHARS:
+        return False
+    letters = sum(ch.isalpha() for ch in text)
+    return letters >= 0.6 * len(text.replace(" ", ""))
+
+
+def _is_end_matter(line: str) -> bool:
+    match = _END_MATTER_RE.match(line)
+    return bool(match) and len(line) <= _MAX_HEADING_CHARS and _is_title(match.group("name"))
+
+
+def _lines(text: str) -> List[tuple]:
+    """(start, end, text) of each non-blank line without its surrounding spaces; page breaks end lines too."""
+    return [
+        (m.start() + len(m.group()) - len(m.group().lstrip()), m.start() + len(m.group().rstrip()), m.group().strip())
+        for m in re.finditer(r"[^\n\x0c]+", text) if m.group().strip()
+    ]
+
+
+def _candidates(text: str) -> List[Dict]:
+    lines = _lines(text)
+    repeated = {line for line, count in Counter(line for _, _, line in lines).items() if count >= _REPEATED_LINE_COUNT}
+    found = []
+    i = 0
+    while i < len(lines):
+        start, end, line = lines[i]
+        i += 1
+        if line in repeated:
+            continue
+        if _is_end_matter(line):
+            found.append({"start": start, "end": end, "kind": "end", "title": line})
+            continue
+        numbered = _NUMBERED_RE.match(line)
+        if numbered:
+            major, sub, roman, title = numbered.groups()
+            # Some layouts put the number on its own line, directly above the title
+            if title is None and i < len(lines) and _is_title(lines[i][2]):
+                title, end = lines[i][2], lines[i][1]
+                i += 1
+            if title and (_is_title(title) or _is_end_matter(title)):
+                kind = "end" if _is_end_matter(title) else "numbered"
+                number = int(major) if major else _roman_to_int(roman)
+                found.append({"start": start, "end": end, "kind": kind, "number": number,
+                              "top": not sub, "title": title})
+            continue
+        abstract = _ABSTRACT_RE.match(line)
+        if abstract:
+            # "Abstract" may head its own paragraph or open it ("Abstract—We propose ...")
+            body_start = end - len(abstract.group(1) or "")
+            found.append({"start": start, "end": body_start, "kind": "abstract", "title": "Abstract"})
+        elif _NAMED_RE.match(line):
+            found.append({"start": start, "end": end, "kind": "named", "title": line})
+        elif line.isupper() and _is_title(line):
+            found.append({"start": start, "end": end, "kind": "caps", "title": line})
+    return found
+
+
+def _numbered_chain(candidates: List[Dict]) -> List[Dict]:
+    """
+    Longest run of top-level headings numbered 1, 2, 3, ... each followed by a real section.
+    Numbers out of sequence (list items, footnote markers, sentences opening with a number)
+    are skipped; between equally long runs the later one wins, since front matter comes first.
+    """
+    top = [c for c in candidates if c["kind"] == "numbered" and c["top"]]
+    best: List[Dict] = []
+    for first in (c for c in top if c["number"] in (0, 1)):
+        chain = [first]
+        for candidate in top:
+            last = chain[-1]
+            if (candidate["start"] > last["start"] and candidate["number"] == last["number"] + 1
+                    and candidate["start"] - last["end"] >= _MIN_SECTION_CHARS):
+                chain.append(candidate)
+        if len(chain) >= len(best):
+            best = chain
+    return best
+
+
+def detect_sections(text: str) -> List[Dict[str, str]]:
+    """
+    Split extracted paper text into [{"title", "text"}] using heading heuristics: numbering
+    ("2 Method", "3.1 Setup", "IV. RESULTS"), well-known section names and all-caps lines.
+    References, acknowledgments and appendices are dropped. Returns [] when fewer than two
+    sections can be told apart, so callers fall back to the raw text.
+    """
+    candidates = _candidates(text)
+    cut = next((c["start"] for c in candidates if c["kind"] == "end"), len(text))
+    candidates = [c for c in candidates if c["start"] < cut]
+
+    headings = _numbered_chain(candidates)
+    if len(headings) < 2:
+        headings = [c for c in candidates if c["kind"] in ("named", "caps")]
+    if not headings:
+        return []
+    abstract = next((c for c in candidates if c["kind"] == "abstract" and c["start"] < headings[0]["start"]), None)
+    if abstract:
+        headings = [abstract] + headings
+
+    sections = []
+    if not abstract:
+        # Title, authors and usually an unlabeled abstract
+        front = text[:headings[0]["start"]].strip()
+        if front:
+            sections.append({"title": "Front matter", "text": front})
+    for heading, following in zip(headings, headings[1:] + [None]):
+        body = text[heading["end"]:following["start"] if following else cut].strip()
+        sections.append({"title": heading["title"], "text": body})
+    if len(sections) < 2:
+        return []
+    logger.debug(f"Detected {len(sections)} sections: {[s['title'] for s in sections]}")
+    return sections
+
+
+def end_matter_start(text: str) -> Optional[int]:
+    """Offset of the first references/acknowledgments/appendix heading, if the text reaches one."""
+    for start, _, line in _lines(text):
+        if _is_end_matter(line):
+            return start
+    return None
+
+
+def _squash(text: str) -> str:
+    """Rejoin words hyphenated across lines and collapse layout whitespace."""
+    return re.sub(r"\s+", " ", re.sub(r"(\w)-\n(\w)", r"\1\2", text)).strip()
+
+
+def _excerpt(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    # Prefer ending on a sentence, then on a word
+    cut = max(head.rfind(". "), head.rfind("。"), head.rfind("．"))
+    if cut < limit // 2:
+        cut = head.rfind(" ")
+    return head[:cut + 1].rstrip() if cut >= limit // 2 else head
+
+
+def section_digest(sections: List[Dict[str, str]], budget: int) -> str:
+    """
+    One "## title" block per section holding the opening of its text, within budget characters.
+    Short sections are kept whole and the rest of the budget is split evenly among longer ones.
+    """
+    bodies = [_squash(s["text"]) for s in sections]
+    headers = [f"## {s['title']}\n" for s in sections]
+    remaining = budget - sum(len(h) + 1 for h in headers)
+    shares = [0] * len(sections)
+    for k, i in enumerate(sorted(range(len(sections)), key=lambda i: len(bodies[i]))):
+        shares[i] = min(len(bodies[i]), max(0, remaining) // (len(sections) - k))
+        remaining -= shares[i]
+    return "\n".join(header + _excerpt(body, share) for header, body, share in zip(headers, bodies, shares))
@@ -1,8 +1,21 @@
+import hashlib
 import os
+import shutil
 import tempfile
-from typing import Optional
+import threading
+import time
+from concurrent.futures import wait
+from typing import List, Optional
 from loguru import logger
 from config import settings
+from services.executor import submit, abandon
+
+# Per-provider caps on concurrent requests; each provider rate-limits differently
+_PROVIDER_SLOTS = {
+    "gtts": threading.BoundedSemaphore(max(1, settings.TTS_CONCURRENCY_GTTS)),
+    "azure": threading.BoundedSemaphore(max(1, settings.TTS_CONCURRENCY_AZURE)),
+    "elevenlabs": threading.BoundedSemaphore(max(1, settings.TTS_CONCURRENCY_ELEVENLABS)),
+}
 
 
 def _synthesize_with_gtts(text: str, lang: str = "ar") -> Optional[str]:
@@ -56,27 +69,131 @@ def _synthesize_with_elevenlabs(text: str, voice_id: str) -> Optional[str]:
         return None
 
 
+# Cached files touched more recently than this are never evicted (they may be mid-render)
+_EVICTION_GRACE_SECONDS = 600
+_CACHE_LOCK = threading.Lock()
+
+
+def _audio_cache_path(provider: str, voice: str, lang: str, text: str) -> str:
+    key = hashlib.sha256(f"{provider}\x00{voice}\x00{lang}\x00{text}".encode("utf-8")).hexdigest()
+    return os.path.join(settings.TTS_CACHE_DIR, f"{key}.mp3")
+
+
+def _store_in_cache(tmp_path: str, cache_path: str) -> str:
+    """Move a freshly synthesized file into the cache; returns the path to use."""
+    try:
+        os.makedirs(settings.TTS_CACHE_DIR, exist_ok=True)
+        staging = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.move(tmp_path, staging)
+        os.replace(staging, cache_path)
+    except Exception as e:
+        logger.warning(f"Could not cache TTS audio: {e}")
+        return tmp_path
+    _evict_audio_cache()
+    return cache_path
+
+
+def _evict_audio_cache():
+    """Drop least recently used audio until the cache fits TTS_CACHE_MAX_BYTES."""
+    with _CACHE_LOCK:
+        try:
+            files = []
+            for name in os.listdir(settings.TTS_CACHE_DIR):
+                if name.endswith(".mp3"):
+                    path = os.path.join(settings.TTS_CACHE_DIR, name)
+                    st = os.stat(path)
+                    files.append((st.st_mtime, st.st_size, path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        now = time.time()
+        for mtime, size, path in sorted(files):
+            if total <= settings.TTS_CACHE_MAX_BYTES or now - mtime < _EVICTION_GRACE_SECONDS:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def _synthesize_cached(provider: str, cache_voice: str, cache_lang: str, func, text: str, **kwargs) -> Optional[str]:
+    """Serve from the audio cache, otherwise synthesize within the provider's concurrency cap."""
+    cache_path = _audio_cache_path(provider, cache_voice, cache_lang, text)
+    if settings.TTS_CACHE_ENABLED and os.path.exists(cache_path):
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(cache_path, None)
+            logger.debug(f"TTS cache hit: {os.path.basename(cache_path)}")
+            return cache_path
+        except OSError:
+            pass
+    with _PROVIDER_SLOTS[provider]:
+        path = func(text, **kwargs)
+    if path and settings.TTS_CACHE_ENABLED:
+        return _store_in_cache(path, cache_path)
+    return path
+
+
 def synthesize_speech(text: str) -> Optional[str]:
     """Return path to synthesized audio file or None on failure."""
     provider = (settings.TTS_PROVIDER or "gtts").lower()
     # Prefer Egyptian dialect voice where applicable
     voice = settings.AZURE_SPEECH_VOICE
     if provider == "azure":
-        path = _synthesize_with_azure(text, voice=voice)
+        path = _synthesize_cached("azure", voice, "ar", _synthesize_with_azure, text, voice=voice)
         if path:
             return path
         logger.warning("Falling back to gTTS after Azure failure")
-        return _synthesize_with_gtts(text, lang="ar")
+        return _synthesize_cached("gtts", "", "ar", _synthesize_with_gtts, text, lang="ar")
     if provider == "elevenlabs":
         if not settings.ELEVENLABS_API_KEY or not settings.ELEVENLABS_VOICE_ID:
             logger.warning("ElevenLabs credentials missing; using gTTS")
-            return _synthesize_with_gtts(text, lang="ar")
-        path = _synthesize_with_elevenlabs(text, voice_id=settings.ELEVENLABS_VOICE_ID)
+            return _synthesize_cached("gtts", "", "ar", _synthesize_with_gtts, text, lang="ar")
+        path = _synthesize_cached("elevenlabs", settings.ELEVENLABS_VOICE_ID, "ar", _synthesize_with_elevenlabs, text, voice_id=settings.ELEVENLABS_VOICE_ID)
         if path:
             return path
         logger.warning("Falling back to gTTS after ElevenLabs failure")
-        return _synthesize_with_gtts(text, lang="ar")
+        return _synthesize_cached("gtts", "", "ar", _synthesize_with_gtts, text, lang="ar")
     # Default gTTS
-    return _synthesize_with_gtts(text, lang="ar")
+    return _synthesize_cached("gtts", "", "ar", _synthesize_with_gtts, text, lang="ar")
+
+
+def tts_deadline() -> float:
+    """Seconds one video's narrations may take; by default half the video budget, leaving the rest for rendering."""
+    return settings.TTS_TIMEOUT or settings.VIDEO_TIMEOUT / 2
+
+
+def synthesize_many(texts: List[str]) -> List[Optional[str]]:
+    """
+    Synthesize several narrations concurrently (bounded per provider).
+    Returns audio paths in input order; None where a text was empty or synthesis failed.
+    """
+    started = time.monotonic()
 
+    def timed(idx: int, text: str) -> Optional[str]:
+        t0 = time.monotonic()
+        path = synthesize_speech(text)
+        logger.info(f"TTS scene {idx}: {time.monotonic() - t0:.2f}s for {len(text)} chars{'' if path else ' (failed)'}")
+        return path
 
+    futures = [submit("tts", timed, idx, text) if text else None for idx, text in enumerate(texts)]
+    # One deadline for the whole batch; scenes still pending when it passes are rendered silent
+    wait([f for f in futures if f is not None], timeout=tts_deadline())
+    paths: List[Optional[str]] = []
+    for idx, fut in enumerate(futures):
+        if fut is None:
+            paths.append(None)
+            continue
+        if not fut.done():
+            abandon(fut)
+            logger.error(f"TTS for scene {idx} timed out")
+            paths.append(None)
+            continue
+        try:
+            paths.append(fut.result())
+        except Exception as e:
+            logger.error(f"TTS for scene {idx} failed: {e}")
+            paths.append(None)
+    logger.info(f"Synthesized {sum(1 for p in paths if p)}/{len(texts)} narrations in {time.monotonic() - started:.2f}s")
+    return paths
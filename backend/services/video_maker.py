@@ -1,29 +1,370 @@
 import tempfile
+import math
 import os
-from typing import List, Dict
+import shutil
+import subprocess
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Dict, Optional, Tuple
 from loguru import logger
+from config import settings
 
 os.environ["IMAGEMAGICK_BINARY"] = r"C:\Program Files\ImageMagick-7.1.2-Q16-HDRI\magick.exe"
 os.environ["IMAGE_MAGICK_CONVERT"] = os.environ["IMAGEMAGICK_BINARY"]
 
 from moviepy.editor import TextClip, concatenate_videoclips, CompositeVideoClip, AudioFileClip, ColorClip
-from services.tts_service import synthesize_speech
+from services.tts_service import synthesize_many
 
 def _estimate_duration(text: str) -> float:
     # Rough estimate: 140 wpm => ~2.33 wps => seconds = words / 2.33
     words = max(1, len(text.split()))
     return max(3.0, words / 2.3)
 
-def make_video_from_scenes(scenes: List[Dict[str, str]], output_path: str = "output_video.mp4") -> str:
+# Output parameters shared by every render engine
+_SIZE = (1280, 720)
+_AUDIO_RATE = 44100
+
+
+def _text_clip(overlay: str, duration: float):
+    return TextClip(
+        overlay,
+        fontsize=48,
+        color='white',
+        size=(1200, None),
+        method='caption',
+        align='center',
+        font='Arial-Bold'
+    ).set_duration(duration).set_position('center')
+
+
+def _load_audio(idx: int, audio_path: Optional[str], narration: str):
+    """Return (AudioFileClip or None, scene duration)."""
+    duration = _estimate_duration(narration)
+    if audio_path and os.path.exists(audio_path):
+        try:
+            audio = AudioFileClip(audio_path)
+            return audio, max(duration, audio.duration)
+        except Exception as e:
+            logger.error(f"Audio load error for scene {idx}: {e}")
+    return None, duration
+
+
+def _compose_scene(overlay: str, audio, actual_duration: float):
+    # Background
+    bg = ColorClip(size=_SIZE, color=(0, 0, 0), duration=actual_duration)
+    
+    # Visual overlay text
+    text_clip = _text_clip(overlay, actual_duration) if overlay else None
+
+    # Combine clips
+    if text_clip:
+        composite = CompositeVideoClip([bg, text_clip])
+    else:
+        composite = bg
+    
+    if audio:
+        composite = composite.set_audio(audio)
+    
+    return composite.set_duration(actual_duration)
+
+
+def _render_with_moviepy(prepared: List[Tuple[int, str, str]], audio_paths: List[Optional[str]], output_path: str, temp_dir: str):
+    """Composite every frame in MoviePy and encode the whole video in one pass."""
+    clips = []
+    for (idx, overlay, narration), audio_path in zip(prepared, audio_paths):
+        audio, actual_duration = _load_audio(idx, audio_path, narration)
+        clips.append(_compose_scene(overlay, audio, actual_duration))
+
+    logger.info("Concatenating video clips...")
+    video = concatenate_videoclips(clips, method="compose")
+    
+    logger.info(f"Writing video to {output_path}...")
+    video.write_videofile(
+        output_path,
+        fps=24,
+        codec='libx264',
+        audio_codec='aac',
+        temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
+        remove_temp=True,
+        # moov atom up front so browsers can start playing over range requests
+        ffmpeg_params=["-movflags", "+faststart"],
+        verbose=False,
+        logger=None
+    )
+    
+    # Close clips to free memory
+    video.close()
+    for clip in clips:
+        clip.close()
+
+
+def _ffmpeg_binary() -> str:
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+
+def _run_ffmpeg(args: List[str]):
+    cmd = [_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error"] + args
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.decode('utf-8', 'replace')[-500:]}")
+
+
+def _render_slide(overlay: str, png_path: str):
+    """Render a scene's static frame (background + overlay) once."""
+    bg = ColorClip(size=_SIZE, color=(0, 0, 0), duration=1)
+    slide = CompositeVideoClip([bg, _text_clip(overlay, 1)]) if overlay else bg
+    slide.save_frame(png_path, t=0)
+    slide.close()
+
+
+def _encode_still_segment(png_path: str, audio_path: Optional[str], duration: float, segment_path: str):
     """
-    Create video from scenes with Arabic narration and text overlays
+    Encode one still image plus narration as an MP4 segment.
+    Every segment uses identical stream parameters so they can be concatenated without re-encoding.
+    """
+    fps = max(1, settings.VIDEO_SLIDE_FPS)
+    args = ["-loop", "1", "-framerate", str(fps), "-i", png_path]
+    if audio_path:
+        args += ["-i", audio_path]
+    else:
+        args += ["-f", "lavfi", "-i", f"anullsrc=channel_layout=stereo:sample_rate={_AUDIO_RATE}"]
+    args += [
+        "-t", f"{duration:.3f}",
+        "-c:v", "libx264", "-tune", "stillimage", "-preset", "veryfast",
+        "-pix_fmt", "yuv420p", "-r", str(fps),
+        # Pad narration with silence to the full scene length so A/V stay in sync across segments
+        "-af", "apad", "-c:a", "aac", "-ar", str(_AUDIO_RATE), "-ac", "2", "-b:a", "128k",
+        segment_path,
+    ]
+    _run_ffmpeg(args)
+
+
+def _concat_segments(segment_paths: List[str], output_path: str, temp_dir: str):
+    """Stitch segments with the concat demuxer (stream copy, no re-encode)."""
+    list_path = os.path.join(temp_dir, "segments.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-movflags", "+faststart", output_path])
+
+
+def _silence(duration: float):
+    """Silent stereo track so every MoviePy segment carries the same streams."""
+    import numpy as np
+    from moviepy.audio.AudioClip import AudioClip
+    return AudioClip(lambda t: np.zeros((len(t), 2)) if np.ndim(t) else [0, 0], duration=duration, fps=_AUDIO_RATE)
+
+
+def _scene_audio(idx: int, audio_path: Optional[str], narration: str) -> Tuple[Optional[str], float]:
+    """Validate a scene's narration audio; returns (usable audio path or None, scene duration)."""
+    audio, duration = _load_audio(idx, audio_path, narration)
+    if audio is None:
+        return None, duration
+    audio.close()
+    return audio_path, duration
+
+
+def _render_scene_segment(engine: str, idx: int, overlay: str, audio_path: Optional[str], duration: float, temp_dir: str) -> str:
+    """
+    Encode a single scene to its own MP4 segment. Runs in a render worker process,
+    so it only takes picklable arguments.
+    """
+    segment_path = os.path.join(temp_dir, f"segment_{idx:03d}.mp4")
+    if engine == "ffmpeg":
+        png_path = os.path.join(temp_dir, f"slide_{idx:03d}.png")
+        _render_slide(overlay, png_path)
+        _encode_still_segment(png_path, audio_path, duration, segment_path)
+        return segment_path
+
+    audio = AudioFileClip(audio_path) if audio_path else None
+    clip = _compose_scene(overlay, audio or _silence(duration), duration)
+    clip.write_videofile(
+        segment_path,
+        fps=24,
+        codec='libx264',
+        audio_codec='aac',
+        audio_fps=_AUDIO_RATE,
+        audio_nbytes=2,
+        ffmpeg_params=["-pix_fmt", "yuv420p", "-ac", "2"],
+        temp_audiofile=os.path.join(temp_dir, f"temp_audio_{idx:03d}.m4a"),
+        remove_temp=True,
+        verbose=False,
+        logger=None
+    )
+    clip.close()
+    if audio:
+        audio.close()
+    return segment_path
+
+
+def hls_dirname(video_filename: str) -> str:
+    """Directory (inside OUTPUT_DIR) holding the HLS rendition of a video."""
+    return f"hls_{os.path.splitext(video_filename)[0]}"
+
+
+def _write_hls_playlist(hls_dir: str, target_duration: int, entries: List[Tuple[str, float]], ended: bool):
+    """Rewrite the EVENT playlist atomically so clients never read a half-written file."""
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    for name, duration in entries:
+        lines += [f"#EXTINF:{duration:.3f},", name]
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    path = os.path.join(hls_dir, "index.m3u8")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(f"{path}.tmp", path)
+
+
+def _close_hls(hls_dir: str, target_duration: int, entries: List[Tuple[str, float]]):
+    """End the playlist so players stop polling; with nothing published the rendition is removed."""
+    try:
+        if entries:
+            _write_hls_playlist(hls_dir, target_duration, entries, ended=True)
+        else:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+    except Exception as e:
+        logger.warning(f"Could not close HLS playlist in {hls_dir}: {e}")
+
+
+def _publish_hls_segment(segment_path: str, hls_dir: str, n: int, offset: float) -> str:
+    """Remux an MP4 segment to MPEG-TS at its position on the overall timeline."""
+    name = f"seg_{n:03d}.ts"
+    _run_ffmpeg([
+        "-i", segment_path, "-c", "copy", "-bsf:v", "h264_mp4toannexb",
+        "-output_ts_offset", f"{offset:.3f}", "-f", "mpegts", os.path.join(hls_dir, name),
+    ])
+    return name
+
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+# Each process that renders gets its own pool, so the default stays small whatever the core count
+_DEFAULT_RENDER_WORKERS = 4
+
+
+def _render_workers() -> int:
+    return settings.VIDEO_RENDER_WORKERS or min(_DEFAULT_RENDER_WORKERS, os.cpu_count() or 1)
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Shared pool of render processes; spawn avoids forking a threaded web worker."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=_render_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+
+def _render_segments(engine: str, prepared: List[Tuple[int, str, str]], audio_paths: List[Optional[str]], output_path: str, temp_dir: str, hls_dir: Optional[str] = None, on_playable: Optional[Callable[[], None]] = None):
+    """
+    Encode scenes as independent segments (in parallel when workers > 1), then concat without re-encoding.
+    With hls_dir, each segment is also published to an HLS playlist as soon as it and all earlier ones are done;
+    on_playable is called once the playlist holds its first segment. The playlist is ended whether or not
+    rendering succeeds.
+    """
+    jobs = []
+    for (idx, overlay, narration), audio_path in zip(prepared, audio_paths):
+        usable_audio, duration = _scene_audio(idx, audio_path, narration)
+        jobs.append((engine, idx, overlay, usable_audio, duration, temp_dir))
+
+    hls_entries: List[Tuple[str, float]] = []
+    target_duration = math.ceil(max(job[4] for job in jobs))
+    if hls_dir:
+        os.makedirs(hls_dir, exist_ok=True)
+
+    segment_paths = []
+    offset = 0.0
+    try:
+        if _render_workers() > 1 and len(jobs) > 1:
+            logger.info(f"Encoding {len(jobs)} segments on up to {_render_workers()} render processes")
+            results = _get_render_pool().map(_render_scene_segment, *zip(*jobs))
+        else:
+            results = (_render_scene_segment(*job) for job in jobs)
+
+        # map() yields in scene order, so each segment is published right after its predecessors
+        for job, segment_path in zip(jobs, results):
+            segment_paths.append(segment_path)
+            if hls_dir:
+                name = _publish_hls_segment(segment_path, hls_dir, len(hls_entries), offset)
+                hls_entries.append((name, job[4]))
+                _write_hls_playlist(hls_dir, target_duration, hls_entries, ended=False)
+                if len(hls_entries) == 1 and on_playable is not None:
+                    try:
+                        on_playable()
+                    except Exception as e:
+                        logger.warning(f"Could not announce HLS playlist: {e}")
+            offset += job[4]
+
+        logger.info(f"Concatenating {len(segment_paths)} segments to {output_path}...")
+        _concat_segments(segment_paths, output_path, temp_dir)
+    except BrokenProcessPool:
+        # A crashed worker poisons the pool; start fresh next time
+        shutdown_render_pool()
+        raise
+    finally:
+        if hls_dir:
+            _close_hls(hls_dir, target_duration, hls_entries)
+
+
+def _render_with_ffmpeg(prepared: List[Tuple[int, str, str]], audio_paths: List[Optional[str]], output_path: str, temp_dir: str, hls_dir: Optional[str] = None, on_playable: Optional[Callable[[], None]] = None):
+    """Render each overlay to a PNG once and let ffmpeg encode still-image segments."""
+    _render_segments("ffmpeg", prepared, audio_paths, output_path, temp_dir, hls_dir=hls_dir, on_playable=on_playable)
+
+
+def _render_with_moviepy_segments(prepared: List[Tuple[int, str, str]], audio_paths: List[Optional[str]], output_path: str, temp_dir: str, hls_dir: Optional[str] = None, on_playable: Optional[Callable[[], None]] = None):
+    """Composite each scene in MoviePy as its own segment so encoding spreads across cores."""
+    _render_segments("moviepy", prepared, audio_paths, output_path, temp_dir, hls_dir=hls_dir, on_playable=on_playable)
+
+
+_RENDERERS = {
+    "moviepy": _render_with_moviepy,
+    "ffmpeg": _render_with_ffmpeg,
+    "moviepy_segments": _render_with_moviepy_segments,
+}
+
+
+def make_video_from_scenes(scenes: List[Dict[str, str]], output_path: str = "output_video.mp4", hls_dir: Optional[str] = None, on_playable: Optional[Callable[[], None]] = None, on_missing_audio: Optional[Callable[[List[int]], None]] = None) -> str:
+    """
+    Create video from scenes with Arabic narration and text overlays.
+    If hls_dir is given, scenes are also published there as an HLS playlist while rendering,
+    and on_playable is called once the playlist exists with its first segment.
+    on_missing_audio is called with the indices of scenes whose narration failed and render silent.
     """
-    clips = []
     temp_dir = tempfile.mkdtemp(prefix="p2v_")
+    # Render beside the target and move it into place only once complete, so output_path
+    # never holds a truncated file that could be served or cached
+    root, ext = os.path.splitext(output_path)
+    partial_path = f"{root}.part{ext}"
     
     try:
         logger.info(f"Creating video with {len(scenes)} scenes")
-        
+
+        # Stage 1: synthesize narration for every scene concurrently
+        prepared = []
         for idx, scene in enumerate(scenes):
             overlay = (scene.get("overlay") or "").strip()
             narration = (scene.get("narration") or overlay).strip()
@@ -31,80 +372,41 @@ def make_video_from_scenes(scenes: List[Dict[str, str]], output_path: str = "out
             if not narration:
                 logger.warning(f"Skipping empty scene {idx}")
                 continue
-            
-            duration = _estimate_duration(narration)
-
-            # TTS audio via provider
-            audio_path = synthesize_speech(narration)
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    audio = AudioFileClip(audio_path)
-                    actual_duration = max(duration, audio.duration)
-                except Exception as e:
-                    logger.error(f"Audio load error for scene {idx}: {e}")
-                    audio = None
-                    actual_duration = duration
-            else:
-                audio = None
-                actual_duration = duration
-
-            # Background
-            bg = ColorClip(size=(1280, 720), color=(0, 0, 0), duration=actual_duration)
-            
-            # Visual overlay text
-            if overlay:
-                text_clip = TextClip(
-                    overlay,
-                    fontsize=48,
-                    color='white',
-                    size=(1200, None),
-                    method='caption',
-                    align='center',
-                    font='Arial-Bold'
-                ).set_duration(actual_duration).set_position('center')
-            else:
-                text_clip = None
-
-            # Combine clips
-            if text_clip:
-                composite = CompositeVideoClip([bg, text_clip])
-            else:
-                composite = bg
-            
-            if audio:
-                composite = composite.set_audio(audio)
-            
-            composite = composite.set_duration(actual_duration)
-            clips.append(composite)
+            prepared.append((idx, overlay, narration))
 
-        if not clips:
+        if not prepared:
             raise ValueError("No valid scenes to render")
 
-        logger.info("Concatenating video clips...")
-        video = concatenate_videoclips(clips, method="compose")
-        
-        logger.info(f"Writing video to {output_path}...")
-        video.write_videofile(
-            output_path,
-            fps=24,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
-            remove_temp=True,
-            verbose=False,
-            logger=None
-        )
-        
-        # Close clips to free memory
-        video.close()
-        for clip in clips:
-            clip.close()
+        audio_paths = synthesize_many([narration for _, _, narration in prepared])
+        silent = [idx for (idx, _, _), path in zip(prepared, audio_paths) if path is None]
+        if silent and on_missing_audio:
+            on_missing_audio(silent)
+
+        # Stage 2: render scenes in order with the configured engine
+        engine = (settings.VIDEO_RENDERER or "moviepy").lower()
+        renderer = _RENDERERS.get(engine)
+        if renderer is None:
+            logger.warning(f"Unknown VIDEO_RENDERER '{engine}', using moviepy")
+            renderer = _render_with_moviepy
+        if hls_dir:
+            if renderer is _render_with_moviepy:
+                # Single-pass rendering has no per-scene segments to publish
+                renderer = _render_with_moviepy_segments
+            renderer(prepared, audio_paths, partial_path, temp_dir, hls_dir=hls_dir, on_playable=on_playable)
+        else:
+            renderer(prepared, audio_paths, partial_path, temp_dir)
+        os.replace(partial_path, output_path)
         
         logger.info(f"Video created successfully: {output_path}")
         return output_path
         
     except Exception as e:
         logger.error(f"Error creating video: {e}", exc_info=True)
+        try:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        except OSError as ce:
+            logger.warning(f"Could not remove partial video {partial_path}: {ce}")
         raise
     finally:
         # Cleanup temp audio files
@@ -117,5 +419,3 @@ def make_video_from_scenes(scenes: List[Dict[str, str]], output_path: str = "out
             os.rmdir(temp_dir)
         except Exception as e:
             logger.warning(f"Could not cleanup temp directory: {e}")
-
-                    
\ No newline at end of file
@@ -0,0 +1,162 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from config import settings
+from services import arxiv_service
+
+_ETAG = '"feed-v1"'
+_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>cs.LG updates on arXiv.org</title>
+<item><title>Sparse Attention for Long Documents</title><link>https://arxiv.org/abs/2401.00001</link>
+<description>We propose sparse attention.</description><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item>
+<item><title>Faster Diffusion Sampling</title><link>https://arxiv.org/abs/2401.00002</link>
+<description>We speed up sampling.</description><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item>
+</channel></rss>"""
+
+
+class FeedServer:
+    """Local stand-in for the arXiv RSS endpoint that honours If-None-Match."""
+
+    def __init__(self):
+        self.requests = []
+        self.failing = False
+        self.delay = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                time.sleep(server.delay)
+                if server.failing:
+                    self.send_response(500)
+                    self.end_headers()
+                elif self.headers.get("If-None-Match") == _ETAG:
+                    self.send_response(304)
+                    self.send_header("ETag", _ETAG)
+                    self.end_headers()
+                else:
+                    body = _FEED.encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/rss+xml")
+                    self.send_header("ETag", _ETAG)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/rss/{{category}}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def feed(monkeypatch, tmp_path):
+    server = FeedServer()
+    monkeypatch.setattr(settings, "ARXIV_FEED_URL", server.url)
+    monkeypatch.setattr(settings, "CACHE_DB_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(arxiv_service, "_initialized", False)
+    # Keep hold of background refreshes so tests can wait for them
+    refreshes = []
+    real_submit = arxiv_service.submit
+
+    def tracking_submit(*args, **kwargs):
+        fut = real_submit(*args, **kwargs)
+        refreshes.append(fut)
+        return fut
+
+    monkeypatch.setattr(arxiv_service, "submit", tracking_submit)
+    server.refreshes = refreshes
+    yield server
+    # Finish refreshes before the settings they read are restored
+    for fut in refreshes:
+        fut.result(timeout=10)
+    server.httpd.shutdown()
+    server.httpd.server_close()
+
+
+def _make_stale(category="cs.LG"):
+    fetched_at = time.time() - settings.FEED_CACHE_TTL - 1
+    arxiv_service._conn().execute("UPDATE feed_cache SET fetched_at = ? WHERE category = ?", (fetched_at, category))
+    return fetched_at
+
+
+def test_fresh_entries_are_served_from_cache(feed):
+    first = arxiv_service.fetch_trending("cs.LG")
+    assert [item["arxiv_id"] for item in first] == ["2401.00001", "2401.00002"]
+    assert arxiv_service.fetch_trending("cs.LG") == first
+    assert len(feed.requests) == 1
+
+
+def test_not_modified_keeps_entries_and_updates_fetched_at(feed):
+    entries = arxiv_service.fetch_trending("cs.LG")
+    stale_at = _make_stale()
+
+    assert arxiv_service._refresh("cs.LG", arxiv_service._load("cs.LG")) == entries
+    assert feed.requests[-1].get("If-None-Match") == _ETAG
+    cached = arxiv_service._load("cs.LG")
+    assert cached["entries"] == entries
+    assert cached["fetched_at"] > stale_at
+
+
+def test_stale_reads_share_one_refresh(feed):
+    entries = arxiv_service.fetch_trending("cs.LG")
+    stale_at = _make_stale()
+
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(arxiv_service.fetch_trending("cs.LG"))) for _ in range(5)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert results == [entries] * 5
+    assert len(feed.refreshes) == 1
+    feed.refreshes[0].result(timeout=10)
+    assert len(feed.requests) == 2
+    assert arxiv_service._load("cs.LG")["fetched_at"] > stale_at
+
+
+def test_failed_refresh_keeps_serving_stale_entries(feed):
+    entries = arxiv_service.fetch_trending("cs.LG")
+    stale_at = _make_stale()
+    feed.failing = True
+
+    assert arxiv_service.fetch_trending("cs.LG") == entries
+    feed.refreshes[0].result(timeout=10)
+    assert len(feed.requests) == 2
+    cached = arxiv_service._load("cs.LG")
+    assert cached["entries"] == entries
+    assert cached["fetched_at"] == pytest.approx(stale_at)
+    # The lease is released, so the next stale read tries again
+    assert arxiv_service.fetch_trending("cs.LG") == entries
+    assert len(feed.refreshes) == 2
+
+
+def test_failed_first_fetch_caches_nothing(feed):
+    feed.failing = True
+    assert arxiv_service.fetch_trending("cs.LG") == []
+    assert arxiv_service._load("cs.LG") is None
+
+
+def test_slow_feed_times_out(feed, monkeypatch):
+    monkeypatch.setattr(settings, "ARXIV_FEED_TIMEOUT", 0.2)
+    feed.delay = 1
+    started = time.monotonic()
+    assert arxiv_service.fetch_trending("cs.LG") == []
+    assert time.monotonic() - started < 1
+    assert arxiv_service._load("cs.LG") is None
+
+
+def test_merge_orders_mixed_timezone_dates(monkeypatch):
+    feeds = {
+        "cs.LG": [{"arxiv_id": "a", "published": "Mon, 01 Jan 2024 10:00:00 -0000"},
+                  {"arxiv_id": "b", "published": "not a date"}],
+        "cs.CL": [{"arxiv_id": "c", "published": "Mon, 01 Jan 2024 12:00:00 +0100"},
+                  {"arxiv_id": "a", "published": "Mon, 01 Jan 2024 10:00:00 -0000"}],
+    }
+    monkeypatch.setattr(arxiv_service, "fetch_trending", lambda category, max_results: feeds[category])
+    merged = arxiv_service.fetch_trending_multi(["cs.LG", "cs.CL"])
+    assert [item["arxiv_id"] for item in merged] == ["c", "a", "b"]
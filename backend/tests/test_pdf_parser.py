@@ -0,0 +1,56 @@
+import time
+import pytest
+from config import settings
+from services import pdf_parser
+
+
+@pytest.fixture
+def backends(monkeypatch, tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"%PDF-1.4\n")
+    monkeypatch.setattr(settings, "PDF_BACKEND_TIMEOUT", 0.3)
+    monkeypatch.setattr(settings, "MAX_PDF_PAGES", 4)
+
+    def use(chain):
+        monkeypatch.setattr(pdf_parser, "_BACKENDS", {name: ((), func) for name, func in chain.items()})
+        monkeypatch.setattr(pdf_parser, "_backend_chain", lambda: list(chain))
+        return str(path)
+
+    return use
+
+
+def _pages(prefix, hang_at=None, fail_at=None):
+    def pages(file_path, start, stop):
+        for index in range(start, stop):
+            if index == hang_at:
+                time.sleep(5)
+            if index == fail_at:
+                raise ValueError("bad content stream")
+            yield f"{prefix}{index}\x0c"
+    return pages
+
+
+def test_timeout_fires_while_a_page_is_still_parsing(backends):
+    path = backends({"slow": _pages("slow", hang_at=1), "pdfminer": _pages("miner")})
+    started = time.monotonic()
+    assert list(pdf_parser.iter_pdf_text(path)) == ["slow0\x0c", "miner1\x0c", "miner2\x0c", "miner3\x0c"]
+    assert time.monotonic() - started < 2
+
+
+def test_consumer_pauses_do_not_count_against_the_backend(backends):
+    path = backends({"fast": _pages("fast")})
+    pages = pdf_parser.iter_pdf_text(path)
+    assert next(pages) == "fast0\x0c"
+    time.sleep(0.5)
+    assert list(pages) == ["fast1\x0c", "fast2\x0c", "fast3\x0c"]
+
+
+def test_failure_resumes_on_the_next_backend(backends):
+    path = backends({"broken": _pages("broken", fail_at=2), "pdfminer": _pages("miner")})
+    assert list(pdf_parser.iter_pdf_text(path)) == ["broken0\x0c", "broken1\x0c", "miner2\x0c", "miner3\x0c"]
+
+
+def test_last_backend_error_is_raised(backends):
+    path = backends({"pdfminer": _pages("miner", fail_at=0)})
+    with pytest.raises(ValueError):
+        list(pdf_parser.iter_pdf_text(path))
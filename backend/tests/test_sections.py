@@ -0,0 +1,55 @@
+from services.sections import detect_sections, end_matter_start, section_digest
+
+
+def _para(sentences: int) -> str:
+    return " ".join(["We evaluate the sparse model on long documents."] * sentences) + "\n"
+
+
+def _paper(page_two_extra: str = "") -> str:
+    """Text laid out the way the PDF backends return it: one form feed per page."""
+    return (
+        "Sparse Attention for Long Documents\nJane Doe1, John Roe2\n1 University of Somewhere\n2 Some Lab\n"
+        "Abstract\n" + _para(4)
+        + "1 Introduction\n" + _para(12) + "\x0c"
+        + "2 Method\n" + _para(6) + page_two_extra + _para(6) + "2.1 Sparse Blocks\n" + _para(6) + "\x0c"
+        + "3 Experiments\n" + _para(10)
+        + "4 Conclusion\n" + _para(6) + "\x0c"
+        + "References\n[1] A. Foo. Attention. 2020.\n"
+        + "Appendix A\n" + _para(10)
+    )
+
+
+def test_detects_numbered_sections_and_drops_end_matter():
+    sections = detect_sections(_paper())
+    assert [s["title"] for s in sections] == ["Abstract", "Introduction", "Method", "Experiments", "Conclusion"]
+    assert "Attention. 2020" not in sections[-1]["text"]
+
+
+def test_wrapped_prose_line_is_not_end_matter():
+    line = "The proofs are deferred to\nAppendix B and show the results below hold for all inputs.\n"
+    text = _paper(line)
+    page_two = text.split("\x0c")[1]
+    assert end_matter_start(page_two) is None
+    assert end_matter_start(text) == text.index("References")
+
+    sections = detect_sections(text)
+    assert [s["title"] for s in sections] == ["Abstract", "Introduction", "Method", "Experiments", "Conclusion"]
+    assert "Appendix B and show" in sections[2]["text"]
+
+
+def test_bare_end_matter_headings():
+    for heading in ("References", "7 References", "Appendix A", "A. Appendix", "Acknowledgments", "REFERENCES"):
+        assert end_matter_start(f"body text\n{heading}\nmore") == len("body text\n"), heading
+    for line in ("Appendix B and show the results below", "References to prior work", "references"):
+        assert end_matter_start(f"body text\n{line}\nmore") is None, line
+
+
+def test_too_few_sections_falls_back():
+    assert detect_sections(_para(40)) == []
+
+
+def test_digest_covers_every_section_within_budget():
+    sections = detect_sections(_paper())
+    digest = section_digest(sections, 1000)
+    assert len(digest) <= 1000
+    assert all(f"## {s['title']}\n" in digest for s in sections)
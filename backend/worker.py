@@ -0,0 +1,112 @@
+"""
+Job runner: processes queued paper jobs outside the web workers.
+
+    python worker.py
+
+Used when JOB_RUNNER_MODE=queue. Runs up to JOB_RUNNER_CONCURRENCY jobs at once, taking
+the highest-priority job first. SIGTERM/SIGINT stop it from claiming new jobs and wait up to
+JOB_DRAIN_TIMEOUT seconds for running ones; anything still unfinished goes back in the queue.
+"""
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from loguru import logger
+from config import settings
+from services import job_queue
+from services.executor import shutdown_executors
+from services.job_manager import set_error, set_status
+from services.pipeline import process_paper_job
+from services.pdf_parser import shutdown_pdf_pool
+from services.video_maker import shutdown_render_pool
+
+_POLL_INTERVAL = 1.0
+
+
+def _renew_leases(runner: str, done: threading.Event):
+    """Keep this runner's claims alive so other runners only take over jobs of a dead or hung one."""
+    interval = max(1.0, settings.JOB_CLAIM_LEASE / 4)
+    while not done.wait(interval):
+        try:
+            job_queue.renew(runner)
+        except Exception as e:
+            logger.warning(f"Could not renew job leases: {e}")
+
+
+def _run(job_id: str, runner: str, payload: dict, slots: threading.Semaphore):
+    try:
+        process_paper_job(job_id, payload["save_path"], payload.get("cache_key"))
+    except Exception as e:
+        # process_paper_job records its own failures; this only catches bugs around it
+        logger.error(f"Runner failed job {job_id}: {e}")
+        set_error(job_id, str(e))
+    finally:
+        job_queue.complete(job_id, runner)
+        slots.release()
+
+
+def main():
+    logger.remove()
+    logger.add(sys.stdout, level=settings.LOG_LEVEL)
+    logger.add("logs/worker.log", rotation="10 MB", retention="7 days", level=settings.LOG_LEVEL)
+
+    runner = job_queue.runner_id()
+    concurrency = max(1, settings.JOB_RUNNER_CONCURRENCY)
+    stopping = threading.Event()
+
+    def request_stop(signum, _frame):
+        if not stopping.is_set():
+            logger.info(f"Received signal {signum}; draining running jobs")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    job_queue.release_orphans()
+    renewing = threading.Event()
+    threading.Thread(target=_renew_leases, args=(runner, renewing), name="p2v-lease", daemon=True).start()
+    logger.info(f"Job runner {runner} started with {concurrency} slot(s)")
+
+    slots = threading.Semaphore(concurrency)
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="p2v-job")
+    running = {}
+    try:
+        while not stopping.is_set():
+            if not slots.acquire(timeout=_POLL_INTERVAL):
+                continue
+            try:
+                claimed = job_queue.claim(runner)
+            except Exception as e:
+                logger.warning(f"Could not claim a job: {e}")
+                claimed = None
+            if claimed is None:
+                slots.release()
+                stopping.wait(_POLL_INTERVAL)
+                continue
+            job_id, payload = claimed
+            logger.info(f"Runner picked up job {job_id}")
+            running = {f: j for f, j in running.items() if not f.done()}
+            running[pool.submit(_run, job_id, runner, payload, slots)] = job_id
+    finally:
+        not_done = [f for f in running if not f.done()]
+        if not_done:
+            logger.info(f"Waiting up to {settings.JOB_DRAIN_TIMEOUT}s for {len(not_done)} running job(s)")
+            _, not_done = wait(not_done, timeout=settings.JOB_DRAIN_TIMEOUT)
+        for fut in not_done:
+            set_status(running[fut], "queued", progress=0)
+        renewing.set()
+        released = job_queue.release(runner)
+        if released:
+            logger.warning(f"{released} job(s) did not finish in time; returned them to the queue")
+        shutdown_executors(wait=False)
+        shutdown_render_pool()
+        shutdown_pdf_pool()
+        logger.info("Job runner stopped")
+    if not_done:
+        # Worker threads cannot be interrupted; exit without joining them
+        os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -69,6 +69,8 @@ st.markdown("""
 # CONFIGURATION
 # =============================
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+# Base URL the *browser* uses for media (the video player fetches directly with range requests)
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "")
 REQUEST_TIMEOUT_DEFAULT = int(os.getenv("REQUEST_TIMEOUT", "600"))
 
 
@@ -152,6 +154,147 @@ def translate_text_api(text: str, target_language: str):
 # PAGE FUNCTIONS
 # =============================
 
+def render_job_result(result):
+    """Show a finished job: summary, translation, raw sections/script, video, field and keywords."""
+    # Show Arabic summary directly
+    summary = result.get("summary", "")
+    st.subheader("📄 الملخص بالعربية")
+    st.write(summary)
+
+    # Translation controls
+    with st.expander("🌐 ترجمة الملخص"):
+        target_lang = st.text_input("اللغة المستهدفة", value="English")
+        if st.button("ترجمة"):
+            translated = translate_text_api(summary, target_lang)
+            if translated:
+                st.text_area("الترجمة", translated, height=300)
+
+    # Sections and script (optional raw view)
+    with st.expander("🧩 Sections & Script (Raw)"):
+        st.json({"sections": result.get("sections", []), "script": result.get("script", [])})
+
+    # Inline video rendering
+    video_url = result.get("video_url")
+    if video_url:
+        # Let the browser stream the MP4 with range requests instead of buffering it here
+        full_url = f"{PUBLIC_API_URL or API_BASE_URL}{video_url}"
+        st.subheader("🎬 الفيديو")
+        st.video(full_url)
+        st.markdown(f"[⬇️ تحميل الفيديو]({full_url})")
+
+    # Keywords & Field
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**🔎 Field**")
+        st.write(result.get("field", "Unknown"))
+    with col2:
+        st.markdown("**🏷️ Keywords**")
+        st.write(", ".join(result.get("keywords", [])))
+
+
+def show_stream_link(placeholder, playlist_url):
+    if playlist_url:
+        placeholder.markdown(f"▶️ [شاهد أثناء التجهيز (HLS)]({PUBLIC_API_URL or API_BASE_URL}{playlist_url})")
+
+
+def poll_job_status(job_id):
+    """Poll /papers/status until the job finishes."""
+    progress = st.progress(0)
+    status_text = st.empty()
+    stream_link = st.empty()
+
+    while True:
+        try:
+            r = requests.get(f"{API_BASE_URL}/papers/status/{job_id}", timeout=120)
+            if r.status_code != 200:
+                status_text.error("Failed to fetch job status")
+                break
+            job = r.json()
+            p = int(job.get("progress", 0))
+            progress.progress(max(0, min(100, p)))
+            status = job.get("status", "")
+            if status == "done":
+                status_text.success("✅ Completed")
+                stream_link.empty()
+                render_job_result(job.get("result", {}))
+                break
+            elif status == "error":
+                status_text.error("❌ Error: " + str(job.get("error", "Unknown")))
+                break
+            else:
+                status_text.info(f"Status: {status} ({p}%)")
+                show_stream_link(stream_link, (job.get("partial") or {}).get("playlist_url"))
+            time.sleep(2)
+        except requests.exceptions.Timeout:
+            # Non-fatal: keep polling
+            status_text.info("Status: polling timed out, retrying...")
+            time.sleep(2)
+            continue
+        except Exception as e:
+            status_text.error(f"Polling error: {e}")
+            time.sleep(2)
+            continue
+
+
+def iter_sse(url):
+    """Yield (event, data) pairs from a Server-Sent Events endpoint."""
+    with requests.get(url, stream=True, timeout=(10, 120), headers={"Accept": "text/event-stream"}) as r:
+        r.raise_for_status()
+        event, data = "message", []
+        for line in r.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if not line:
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+
+
+def follow_job_events(job_id):
+    """Follow /papers/events, showing each stage's output as soon as the server publishes it."""
+    progress = st.progress(0)
+    status_text = st.empty()
+    stream_link = st.empty()
+    sections_box = st.empty()
+    script_box = st.empty()
+
+    try:
+        for event, data in iter_sse(f"{API_BASE_URL}/papers/events/{job_id}"):
+            if event == "progress":
+                p = int(data.get("progress") or 0)
+                progress.progress(max(0, min(100, p)))
+                status_text.info(f"Status: {data.get('status')} ({p}%)")
+            elif event == "partial":
+                if data.get("sections"):
+                    with sections_box.container():
+                        st.markdown("**🧩 الأقسام**")
+                        for section in data["sections"]:
+                            st.markdown(f"- **{section.get('title', '')}**: {section.get('summary', '')}")
+                if data.get("script"):
+                    with script_box.expander("📝 نص الفيديو", expanded=False):
+                        st.json(data["script"])
+                show_stream_link(stream_link, data.get("playlist_url"))
+            elif event == "done":
+                progress.progress(100)
+                status_text.success("✅ Completed")
+                for box in (stream_link, sections_box, script_box):
+                    box.empty()
+                render_job_result(data or {})
+                return
+            elif event == "error":
+                status_text.error("❌ Error: " + str(data.get("error", "Unknown")))
+                return
+    except Exception as e:
+        # Proxies without streaming support or dropped connections: fall back to polling
+        status_text.warning(f"Live updates unavailable ({e}); polling instead")
+    poll_job_status(job_id)
+
+
+
 def upload_paper_page(api_healthy):
     st.header("📤 Upload Research Paper")
     st.markdown("Upload a PDF research paper to generate a video explanation")
@@ -162,6 +305,7 @@ def upload_paper_page(api_healthy):
 
     uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf"])
     timeout_seconds = st.number_input("Request timeout (seconds)", min_value=60, max_value=3600, value=REQUEST_TIMEOUT_DEFAULT, step=30, help="Increase if your paper is long.")
+    live_updates = st.checkbox("Live updates", value=True, help="Stream progress and partial results from the server instead of polling.")
 
     if uploaded_file and st.button("🚀 Process Paper", type="primary"):
         response = upload_paper(uploaded_file, timeout_seconds=timeout_seconds)
@@ -172,83 +316,10 @@ def upload_paper_page(api_healthy):
                 st.error("❌ Failed to start job.")
                 return
             st.info(f"Job started: {job_id}")
-            progress = st.progress(0)
-            status_text = st.empty()
-            result_placeholder = st.empty()
-
-            import time
-            while True:
-                try:
-                    r = requests.get(f"{API_BASE_URL}/papers/status/{job_id}", timeout=120)
-                    if r.status_code != 200:
-                        status_text.error("Failed to fetch job status")
-                        break
-                    job = r.json()
-                    p = int(job.get("progress", 0))
-                    progress.progress(max(0, min(100, p)))
-                    status = job.get("status", "")
-                    if status == "done":
-                        status_text.success("✅ Completed")
-                        result = job.get("result", {})
-
-                        # Show Arabic summary directly
-                        summary = result.get("summary", "")
-                        st.subheader("📄 الملخص بالعربية")
-                        st.write(summary)
-
-                        # Translation controls
-                        with st.expander("🌐 ترجمة الملخص"):
-                            target_lang = st.text_input("اللغة المستهدفة", value="English")
-                            if st.button("ترجمة"):
-                                translated = translate_text_api(summary, target_lang)
-                                if translated:
-                                    st.text_area("الترجمة", translated, height=300)
-
-                        # Sections and script (optional raw view)
-                        with st.expander("🧩 Sections & Script (Raw)"):
-                            st.json({"sections": result.get("sections", []), "script": result.get("script", [])})
-
-                        # Inline video rendering
-                        video_url = result.get("video_url")
-                        if video_url:
-                            full_url = f"{API_BASE_URL}{video_url}"
-                            try:
-                                vr = requests.get(full_url, timeout=120)
-                                if vr.status_code == 200:
-                                    st.subheader("🎬 الفيديو")
-                                    st.video(vr.content)
-                                else:
-                                    st.warning("Could not fetch video bytes, showing link instead")
-                                    st.write(full_url)
-                            except Exception:
-                                st.warning("Could not fetch video bytes, showing link instead")
-                                st.write(full_url)
-
-                        # Keywords & Field
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown("**🔎 Field**")
-                            st.write(result.get("field", "Unknown"))
-                        with col2:
-                            st.markdown("**🏷️ Keywords**")
-                            st.write(", ".join(result.get("keywords", [])))
-
-                        break
-                    elif status == "error":
-                        status_text.error("❌ Error: " + str(job.get("error", "Unknown")))
-                        break
-                    else:
-                        status_text.info(f"Status: {status} ({p}%)")
-                    time.sleep(2)
-                except requests.exceptions.Timeout:
-                    # Non-fatal: keep polling
-                    status_text.info("Status: polling timed out, retrying...")
-                    time.sleep(2)
-                    continue
-                except Exception as e:
-                    status_text.error(f"Polling error: {e}")
-                    time.sleep(2)
-                    continue
+            if live_updates:
+                follow_job_events(job_id)
+            else:
+                poll_job_status(job_id)
         else:
             st.error("❌ Failed to process paper.")
 
@@ -283,12 +354,16 @@ def trending_papers_page(api_healthy):
         st.info("Please ensure the backend API is running before fetching trending papers.")
         return
 
-    category = st.selectbox("Select Category", ["cs.LG", "cs.CV", "cs.CL", "cs.AI", "cs.NE", "stat.ML"])
+    categories = st.multiselect("Select Categories", ["cs.LG", "cs.CV", "cs.CL", "cs.AI", "cs.NE", "stat.ML"], default=["cs.LG"])
     limit = st.slider("Number of Papers", 5, 50, 10)
 
     if st.button("🔍 Fetch Trending Papers", type="primary"):
+        if not categories:
+            st.warning("Please select at least one category")
+            return
         with st.spinner("Fetching trending papers..."):
-            response = fetch_trending(category=category, limit=limit)
+            # One request; the backend fetches the feeds concurrently and merges them
+            response = fetch_trending(category=",".join(categories), limit=limit)
             if response and response.status_code == 200:
                 data = response.json()
                 items = data.get('items', [])